@@ -1,21 +1,37 @@
 import json
 import logging
+import os
 import threading
 import tkinter as tk
 from datetime import datetime
+from functools import partial
 # from typing import Any, Tuple, cast
 from tkinter import filedialog, messagebox, ttk, scrolledtext
 
 import dblib
 import jsonlines
-import requests
-import sqlparse
 from requests.auth import HTTPBasicAuth
 
+from bulk_loader import BulkLoader
+from jsonl_sender import TOKEN_URL, VERIFY_TLS, JSONLSender
+from multi_send import MultiFileSender, find_record_files
+from record_source import RecordSource
+from record_store import CompactRecordStore
+from record_validator import RecordValidator
+from send_checkpoint import SendCheckpoint
+from sql_trace import SQLTracer, TracedConnection
+from token_auth import TokenAuth, TokenError
+
 # Dummy credentials
 USERNAME = "usrname"
 PASSWORD = "usrpwd"
 
+DB_BATCH_SIZE = 10000  # records handed to dblib.send_data at a time
+JSONL_BATCH_SIZE = 10000  # upper bound on records per POST; batches are otherwise sized by bytes
+SQL_TRACE_SAMPLE_RATE = 0.01  # share of bulk-load statements written to the debug log
+MAX_CONCURRENT_FILES = 4  # files sent at the same time when several are selected
+MAX_TOTAL_IN_FLIGHT = 8  # JSONL batches uploading at the same time over all files
+
 # Example JSON record
 json_record = {
     "sn": "1234567890",
@@ -43,30 +59,11 @@ json_record = {
 }
 
 
-
-def log_query(query, params):
-    """
-    Logs the query with parameters substituted for debugging.
-    """
-    formatted_query = query
-    for key, value in params.items():
-        # Format values correctly for SQL (strings need quotes)
-        if isinstance(value, str):
-            value = f"'{value}'"
-        elif isinstance(value, bool):
-            value = "TRUE" if value else "FALSE"
-        elif value is None:
-            value = "NULL"
-        formatted_query = formatted_query.replace(f"%({key})s", str(value))
-
-    logging.debug("Executing query:\n" + sqlparse.format(formatted_query, reindent=True))
-
-
 class JSONToDBApp:
     def __init__(self):
         self.root = tk.Tk()  # Create the root Tkinter window
         self.root.title("JSON to DB App")
-        self.root.geometry("600x300")
+        self.root.geometry("600x540")
 
         # Load the dbconfig once
         self.dbconfig = dblib.load_config()  # Load DB configuration
@@ -79,22 +76,52 @@ class JSONToDBApp:
         self.file_label = tk.Label(self.root, text="No file selected")
         self.file_label.pack(pady=10)
 
-        # Button to open file dialog
-        self.select_button = tk.Button(self.root, text="Select JSON File", command=self.select_file)
-        self.select_button.pack(pady=5)
+        # Buttons to open a file dialog: one file, several files, or every JSON/JSONL file of a folder
+        self.select_frame = tk.Frame(self.root)
+        self.select_frame.pack(pady=5)
+        self.select_button = tk.Button(self.select_frame, text="Select JSON File", command=self.select_file)
+        self.select_button.pack(side="left", padx=5)
+        tk.Button(self.select_frame, text="Select Files", command=self.select_files).pack(side="left", padx=5)
+        tk.Button(self.select_frame, text="Select Folder", command=self.select_folder).pack(side="left", padx=5)
+        # Parse the file once into a compact column store and send from memory instead of re-reading it
+        self.keep_in_memory = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.root, text="Keep records in memory (compact)", variable=self.keep_in_memory).pack()
 
         # Button to send data to DB
         self.send_button = tk.Button(self.root, text="Send to DB", command=self.send_data, state=tk.DISABLED)
-        self.send_button.pack(pady=10)
+        self.send_button.pack(pady=(10, 0))
+        # Load into the jot_records/jot_testinfo tables with multi-row INSERT/COPY and upsert, resuming after an
+        # abort; unchecked, records go through dblib.send_data, which only resumes whole batches
+        self.bulk_load = tk.BooleanVar(value=True)
+        tk.Checkbutton(self.root, text="Bulk load (records + testinfo tables)",
+                       variable=self.bulk_load).pack(pady=(0, 5))
 
         # Button: Send to JSONL Server
         self.send_jsonl_button = tk.Button(self.root, text="Send to JSONL Server", command=self.send_to_jsonl_server,
                                            state=tk.DISABLED)
         self.send_jsonl_button.pack(pady=5)
+        self.compress_uploads = tk.BooleanVar(value=False)  # gzip request bodies; the server must accept it
+        tk.Checkbutton(self.root, text="Compress uploads (gzip)", variable=self.compress_uploads).pack()
+        # Check records against the json_record shape; invalid ones go to a reject file instead of failing a batch.
+        # The bulk loader rejects records without a complete key either way.
+        self.validate_records = tk.BooleanVar(value=True)
+        tk.Checkbutton(self.root, text="Validate records (rejects to <file>.rejects.jsonl)",
+                       variable=self.validate_records).pack()
 
         self.progress = ttk.Progressbar(self.root, orient="horizontal", length=500, mode="determinate")
         self.progress.pack(pady=5)
 
+        # Per-file status when several files are selected
+        self.file_tree = ttk.Treeview(self.root, columns=("records", "progress", "status"), height=5)
+        self.file_tree.heading("#0", text="File")
+        self.file_tree.heading("records", text="Records")
+        self.file_tree.heading("progress", text="Progress")
+        self.file_tree.heading("status", text="Status")
+        self.file_tree.column("#0", width=280)
+        for column, width in (("records", 80), ("progress", 70), ("status", 80)):
+            self.file_tree.column(column, width=width, anchor="e")
+        self.file_tree.pack(pady=5)
+
         # Abort button (initially disabled)
         self.abort_button = tk.Button(self.root, text="Abort sending", command=self.abort_sending, state=tk.DISABLED)
         self.abort_button.pack(pady=5)
@@ -114,10 +141,16 @@ class JSONToDBApp:
         # self.time_remaining_label = tk.Label(self.time_frame, text="Remaining: 00:00:00.0")
         # self.time_remaining_label.pack(side="left", padx=5)
 
-        # JSON data placeholder
-        self.json_data = None
+        # Streaming source of the selected file; records are read batch by batch while sending
+        self.source = None
+        self.total_records = 0
+        # Files selected with "Select Files"/"Select Folder"; each is counted and streamed when it is sent
+        self.files = []
+        self.multi_sender = None
         self.sending_thread = None  # will hold the reference to the sending thread
         self.abort_event = threading.Event()  # flag to signal abort
+        # Bearer token fetched once from /token and shared by all upload threads until it nears expiry
+        self.token_auth = TokenAuth(TOKEN_URL, USERNAME, PASSWORD, verify=VERIFY_TLS, log=self.log)
 
         # Log output with scroll
         self.log_output = scrolledtext.ScrolledText(self.root, height=10, width=70, wrap=tk.WORD)
@@ -133,30 +166,65 @@ class JSONToDBApp:
 
     def select_file(self):
         """Open file dialog to select a JSON or JSONL file and load it accordingly."""
-        file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json;*.jsonl")])
+        file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json;*.jsonl;*.jsonl.gz;*.jsonl.xz")])
 
         if file_path:
+            self.set_files([])
             self.file_label.config(text=f"Selected file: {file_path}")
             self.load_json(file_path)  # Used for both JSON and JSONL files
 
+    def select_files(self):
+        """Select several JSON/JSONL files to send concurrently."""
+        file_paths = filedialog.askopenfilenames(filetypes=[("JSON files", "*.json;*.jsonl;*.jsonl.gz;*.jsonl.xz")])
+        if file_paths:
+            self.set_files(list(file_paths))
+
+    def select_folder(self):
+        """Select a folder (e.g. the per-origin output of xml2json2) and send all its JSON/JSONL files."""
+        folder = filedialog.askdirectory()
+        if folder:
+            files = find_record_files(folder)
+            if not files:
+                messagebox.showinfo("Info", "No JSON/JSONL files in the selected folder.")
+                return
+            self.set_files(files)
+
+    def set_files(self, file_paths):
+        """Switch to sending several files (an empty list goes back to the single-file mode)."""
+        self.files = file_paths
+        self.file_tree.delete(*self.file_tree.get_children())
+        for path in file_paths:
+            self.file_tree.insert("", tk.END, iid=path, text=os.path.basename(path), values=("", "", "queued"))
+        if file_paths:
+            self.source = None
+            self.total_records = 0
+            self.file_label.config(text=f"Selected {len(file_paths)} files")
+            self.send_button.config(state=tk.NORMAL)
+            self.send_jsonl_button.config(state=tk.NORMAL)
+            self.log(f"Selected {len(file_paths)} files.")
+
     def load_json(self, file_path):
-        """Load and parse JSON or JSONL data, handling errors gracefully."""
+        """Open a JSON or JSONL file as a streaming source and count its records, handling errors gracefully.
+
+        By default nothing is kept in memory and the records are read again batch by batch while sending; with
+        "Keep records in memory" they are parsed once into a CompactRecordStore.
+        """
         try:
-            with (jsonlines.open(file_path, "r") if file_path.endswith(".jsonl")
-            else open(file_path, "r", encoding="utf-8")) as file:
-                data = list(file) if file_path.endswith(".jsonl") else json.load(file)
-
-            if isinstance(data, list):
-                self.json_data = data
-                self.send_button.config(state=tk.NORMAL)
-                self.send_jsonl_button.config(state=tk.NORMAL)
-                self.log(f"File contains #records: {len(data)}")
-            else:
-                raise ValueError("Invalid JSON format: Expected a list of records.")
+            source = RecordSource(file_path)
+            if self.keep_in_memory.get():
+                source = CompactRecordStore.from_source(source)
+                self.log(f"Records held in about {source.nbytes() / 1e6:.1f} MB.")
+            total_records = source.count()
+            self.source = source
+            self.total_records = total_records
+            self.send_button.config(state=tk.NORMAL)
+            self.send_jsonl_button.config(state=tk.NORMAL)
+            self.log(f"File contains #records: {total_records}")
 
         except (UnicodeDecodeError, json.JSONDecodeError, jsonlines.InvalidLineError, ValueError) as e:
             messagebox.showerror("Error", f"Invalid JSON: {e}")
-            self.json_data = []  # Reset buffer
+            self.source = None  # Reset source
+            self.total_records = 0
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load JSON: {e}")
 
@@ -172,26 +240,15 @@ class JSONToDBApp:
                 log_file.write(f"{datetime.now()}: {message}\n")
 
     def authenticate(self):
-        """Authenticate with the server using the provided credentials."""
-        auth_url = "https://127.0.0.1:5444/token"
+        """Authenticate with the server using the provided credentials; the token is cached in self.token_auth."""
         try:
-            # Attempt to get the token using HTTP Basic Authentication
-            response = requests.get(auth_url, auth=HTTPBasicAuth(USERNAME, PASSWORD))
-            if response.status_code == 200:
-                # Assume the server returns a JSON response with the token
-                token = response.json().get('token')
-                if token:
-                    self.log(f"Authentication successful. Token: {token}")
-                    return token
-                else:
-                    self.log("Authentication failed: No token returned.")
-            else:
-                self.log(f"Authentication failed. Status code: {response.status_code}")
+            return self.token_auth.token()
+        except TokenError as e:
+            self.log(str(e))
         except Exception as e:
             self.log(f"Error during authentication: {e}")
         return None
 
-
     def send_in_background(self, target):
         self.time_start_label.config(text=f"Process Start Time: {self.start_time.strftime('%H:%M:%S')}")
         self.time_elapsed_label.config(text="Elapsed: 00:00:00")
@@ -208,14 +265,18 @@ class JSONToDBApp:
                 # Initialize pool if not already done
                 if not self.db_pool:
                     self.db_pool = dblib.get_db_pool(self.dbconfig)
-                # Pass abort_event to dblib.send_data
-                if dblib.send_data(self.json_data, self.root, self.progress, self.db_pool,
-                                   abort_event=self.abort_event):
+                send = self._bulk_load_to_db if self.bulk_load.get() else self._send_to_db
+            else:
+                send = self._send_to_jsonl_server
+            if self.files:
+                self._send_files(send, target)
+            elif target == "db":
+                if send(self.source, self.total_records, self.set_progress):
                     self.log("Data successfully sent to the database.")
                 else:
                     self.log("Data transfer to database failed.")
-            elif target == "jsonl":
-                self._send_to_jsonl_server()
+            else:
+                send(self.source, self.total_records, self.set_progress)
         except Exception as e:
             self.log(f"Error sending data: {e}")
         finally:
@@ -223,9 +284,71 @@ class JSONToDBApp:
             # Disable Abort button when done
             self.abort_button.config(state=tk.DISABLED)
 
+    def _send_files(self, send, target):
+        """Send all selected files, MAX_CONCURRENT_FILES at a time, with per-file rows and a summary."""
+        self.log(f"Sending {len(self.files)} files, {MAX_CONCURRENT_FILES} at a time...")
+        if target == "jsonl":
+            send = partial(send, slots=threading.BoundedSemaphore(MAX_TOTAL_IN_FLIGHT))
+        self.multi_sender = MultiFileSender(send, max_files=MAX_CONCURRENT_FILES, abort_event=self.abort_event,
+                                            log=self.log, on_update=self.update_file_row)
+        summary = self.multi_sender.run(self.files)
+        self.multi_sender.log_summary(summary)
+
+    def update_file_row(self, path, state):
+        """Show one file's state in the tree and the overall progress over all files."""
+        percent = f"{100 * state['sent'] / state['total']:.0f}%" if state["total"] else ""
+        self.file_tree.item(path, values=(state["total"] or "", percent, state["status"]))
+        self.set_progress(*self.multi_sender.totals())
+
+    def _send_to_db(self, source, total_records, on_progress):
+        """Stream the source to dblib.send_data in bounded batches; True if every batch was sent.
+
+        Sent batches are recorded in a SendCheckpoint, so sending the unchanged file again after an abort skips
+        them. dblib.send_data has no conflict handling, so a batch interrupted halfway is inserted again in full;
+        the bulk loader's upsert avoids that.
+        """
+        checkpoint = SendCheckpoint(source.path, "dblib")
+        sent = resumed = checkpoint.load()
+        if resumed:
+            self.log(f"Resuming: {resumed} records were already sent.")
+        start = 0
+        for batch in source.batches(DB_BATCH_SIZE):
+            end = start + len(batch)
+            if checkpoint.is_acked(start):  # batches line up with the earlier run's, the file being unchanged
+                start = end
+                continue
+            if self.abort_event.is_set():
+                self.log("Abort flag set. Halting further database batches. Sending the file again resumes here.")
+                return False
+            # Pass abort_event to dblib.send_data
+            if not dblib.send_data(batch, self.root, self.progress, self.db_pool, abort_event=self.abort_event):
+                return False
+            checkpoint.ack(start, end)
+            sent += len(batch)
+            start = end
+            on_progress(sent, total_records)
+        checkpoint.clear()
+        self.log(f"Sent {sent - resumed} records.")
+        return True
+
+    def _bulk_load_to_db(self, source, total_records, on_progress):
+        """Bulk-load the source through a pooled connection; True if every transaction was committed."""
+        # Statement latency/row histograms; sampled statements are only formatted if the log record is emitted
+        tracer = SQLTracer(sample_rate=SQL_TRACE_SAMPLE_RATE)
+        connection = self.db_pool.getconn()
+        try:
+            loader = BulkLoader(TracedConnection(connection, tracer), "postgres",
+                                validator=RecordValidator() if self.validate_records.get() else None, log=self.log,
+                                abort_event=self.abort_event, on_progress=on_progress)
+            loader.create_tables()
+            return loader.load(source, total_records)
+        finally:
+            tracer.log_summary(self.log)
+            self.db_pool.putconn(connection)
+
     def send_data(self):
         """Sends data to the database in the background."""
-        if self.json_data:
+        if self.source or self.files:
             self.log("Sending data to database...")
             self.start_time = datetime.now()
             self.sending_thread = threading.Thread(target=self.send_in_background, args=("db",), daemon=True)
@@ -233,7 +356,7 @@ class JSONToDBApp:
 
     def send_to_jsonl_server(self):
         """Sends JSON data to the JSONL server in the background."""
-        if self.json_data:
+        if self.source or self.files:
             self.log("Sending data to JSONL server...")
             self.start_time = datetime.now()
             self.sending_thread = threading.Thread(target=self.send_in_background, args=("jsonl",), daemon=True)
@@ -243,49 +366,33 @@ class JSONToDBApp:
         self.log("Abort requested. Waiting for current batch to finish...")
         self.abort_event.set()  # Signal abort
 
-    def _send_to_jsonl_server(self):
-        jsonl_srv_url = "https://127.0.0.1:5444/data"  # Use HTTPS
-        if not self.json_data:
+    def _send_to_jsonl_server(self, source, total_records, on_progress, slots=None):
+        """Send one source to the JSONL server; True once the server confirmed the end of the transfer."""
+        if not source:
             self.log("No JSON data loaded.")
-            return
+            return False
+        log = self.log
+        if self.files:  # several files log concurrently; tell them apart
+            name = os.path.basename(source.path)
+            log = lambda message, log_to_error_file=False: self.log(f"{name}: {message}", log_to_error_file)
         try:
             self.log("Initializing connection with JSONL server...")
-
-            # Basic Authentication headers
-            auth = HTTPBasicAuth(USERNAME, PASSWORD)
-
-            headers = {"Content-Type": "application/json"}
-            timeout = 2  # seconds
-            batch_size = 10000
-            with requests.Session() as session:
-                # Send the start message with authentication
-                start_msg = {"control": "start", "total_records": len(self.json_data)}
-                response = session.post(jsonl_srv_url, json=start_msg, headers=headers, auth=auth, timeout=timeout,
-                                        verify=False)  # 'verify=True' to use default CA bundle
-                self.log(f"Start message response: {response.status_code} - {response.text}")
-                if response.status_code != 200:
-                    self.log("Start message failed. Aborting data transfer.")
-                    return
-                # Send the data in batches with authentication
-                for i in range(0, len(self.json_data), batch_size):
-                    if self.abort_event.is_set():
-                        self.log("Abort flag set. Halting further JSONL batches.")
-                        break
-                    batch = self.json_data[i:i + batch_size]
-                    response = session.post(jsonl_srv_url, json=batch, headers=headers, auth=auth, timeout=timeout,
-                                            verify=False) # /path/to/certificate.crt' for testing self-signed.  # 'verify=True' for SSL verification
-                    self.log(f"Sent batch {i // batch_size + 1}, status: {response.status_code}")
-                    if response.status_code != 200:
-                        self.log(f"Failed to send batch {i // batch_size + 1}, aborting further transfers.")
-                        return
-                # Send the end message with authentication
-                end_msg = {"control": "end"}
-                response = session.post(jsonl_srv_url, json=end_msg, headers=headers, auth=auth, timeout=timeout,
-                                        verify=False)  # 'verify=True'
-                self.log(f"End message response: {response.status_code} - {response.text}")
-                self.log("Data transfer complete.")
+            if self.authenticate():
+                auth = self.token_auth
+            else:
+                self.log("Falling back to HTTP Basic authentication on every request.")
+                auth = HTTPBasicAuth(USERNAME, PASSWORD)
+            sender = JSONLSender(auth=auth, max_batch_records=JSONL_BATCH_SIZE,
+                                 compress=self.compress_uploads.get(),
+                                 validator=RecordValidator() if self.validate_records.get() else None,
+                                 slots=slots, log=log, abort_event=self.abort_event, on_progress=on_progress)
+            return sender.send(source, total_records)
         except Exception as e:
             self.log(f"Error sending to JSONL server: {e}", log_to_error_file=True)
+            return False
+
+    def set_progress(self, sent, total):
+        self.progress["value"] = 100 * sent / max(1, total)
 
     def update_elapsed_time(self):
         """Update the elapsed time label while the sending thread is still alive."""
@@ -0,0 +1,314 @@
+import argparse
+import csv
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from record_codec import TEST_ROW_FIELDS, as_bool, as_int, as_number, as_text, test_row
+from record_source import RecordSource, default_log
+from record_validator import REJECT_SUFFIX, RecordValidator, RejectFile
+from send_checkpoint import SendCheckpoint
+from sql_trace import SQLTracer, TracedConnection
+
+RECORDS_TABLE = "jot_records"
+TESTINFO_TABLE = "jot_testinfo"
+KEY_COLUMNS = ("sn", "timestamp", "origin")  # identifies a jot; the child rows carry it as their foreign key
+TRANSACTION_RECORDS = 5000  # parent records per commit
+ROWS_PER_STATEMENT = 500  # rows per multi-row INSERT
+SQLITE_MAX_VARIABLES = 999  # conservative default of older SQLite builds
+DIALECTS = ("sqlite", "postgres")
+CHECKPOINT_TARGET = "db"
+
+# (column, SQL type); the types are written to suit both SQLite and PostgreSQL.
+RECORD_COLUMNS = (
+    ("sn", "TEXT NOT NULL"),
+    ("timestamp", "TEXT NOT NULL"),
+    ("origin", "TEXT NOT NULL"),
+    ("ItemNr", "TEXT"),
+    ("WorkPlan", "TEXT"),
+    ("WorkPlanIndex", "INTEGER"),
+    ("bom_name", "TEXT"),
+    ("bom_index", "INTEGER"),
+    ("serie", "TEXT"),
+    ("verification", "BOOLEAN"),
+    ("comment", "TEXT"),
+    ("status", "TEXT"),
+)
+TESTINFO_COLUMNS = (
+    ("sn", "TEXT NOT NULL"),
+    ("timestamp", "TEXT NOT NULL"),
+    ("origin", "TEXT NOT NULL"),
+    ("test_index", "INTEGER NOT NULL"),
+    ("id", "TEXT"),  # from here on, TEST_ROW_FIELDS in order
+    ("description", "TEXT"),
+    ("value", "DOUBLE PRECISION"),  # numeric and boolean values; booleans as 1.0/0.0
+    ("value_text", "TEXT"),  # values that are not numbers
+    ("limit_low", "DOUBLE PRECISION"),
+    ("limit_high", "DOUBLE PRECISION"),
+    ("unit", "TEXT"),
+    ("ok", "BOOLEAN"),
+)
+TABLE_KEYS = {RECORDS_TABLE: KEY_COLUMNS, TESTINFO_TABLE: KEY_COLUMNS + ("test_index",)}
+
+assert tuple(name for name, _ in TESTINFO_COLUMNS[len(KEY_COLUMNS) + 1:]) == TEST_ROW_FIELDS
+
+_CONVERT = {"TEXT": as_text, "INTEGER": as_int, "BOOLEAN": as_bool, "DOUBLE": as_number}
+_RECORD_CONVERTERS = [(name, _CONVERT[sql_type.split()[0]]) for name, sql_type in RECORD_COLUMNS]
+
+
+def record_rows(record):
+    """(parent row, [testinfo rows]) tuples for one JSON record, in RECORD_COLUMNS/TESTINFO_COLUMNS order."""
+    parent = tuple(convert(record.get(name)) for name, convert in _RECORD_CONVERTERS)
+    key = parent[:3]
+    children = []
+    for index, test in enumerate(record.get("testinfo") or []):
+        children.append(key + (index,) + test_row(test))
+    return parent, children
+
+
+def missing_keys(record):
+    """Reasons, in RecordValidator's format, for key columns a record cannot be stored without; None if complete."""
+    missing = [f"{name}: missing" for name in KEY_COLUMNS if record.get(name) in (None, "")]
+    return missing or None
+
+
+class BulkLoader:
+    """Loads JSON records into a parent table (one row per jot) and a testinfo child table.
+
+    Rows go in with multi-row INSERT statements, or with COPY on PostgreSQL connections that offer
+    `copy_expert` (psycopg2), and are committed every `transaction_records` parent records. Works with any
+    DB-API connection; a local SQLite file serves as the stand-in for tests and benchmarks.
+
+    With `upsert` (the default) a record replaces the stored one with the same (sn, timestamp, origin),
+    testinfo rows included, so loading a file twice leaves the tables as if it was loaded once. Each committed
+    transaction's record range goes into a SendCheckpoint, and a load of the same unchanged file resumes with
+    the first range that was not committed; a range committed just before a crash is simply upserted again.
+
+    Records without a complete key, or failing the optional `validator` (see record_validator), are written to
+    `<source>.rejects.jsonl` instead of failing their transaction, and count as handled in the checkpoint, so a
+    resumed load neither stops at them again nor rejects them twice.
+    """
+
+    def __init__(self, connection, dialect="sqlite", transaction_records=TRANSACTION_RECORDS,
+                 rows_per_statement=ROWS_PER_STATEMENT, upsert=True, validator=None, log=None, abort_event=None,
+                 on_progress=None):
+        if dialect not in DIALECTS:
+            raise ValueError(f"Unknown SQL dialect: {dialect}")
+        self.connection = connection
+        self.dialect = dialect
+        self.transaction_records = transaction_records
+        self.rows_per_statement = rows_per_statement
+        self.upsert = upsert
+        self.validator = validator
+        self.log = log or default_log
+        self.abort_event = abort_event or threading.Event()
+        self.on_progress = on_progress  # on_progress(records loaded, total records)
+        self.placeholder = "?" if dialect == "sqlite" else "%s"
+        self.use_copy = dialect == "postgres" and hasattr(connection.cursor(), "copy_expert")
+        self.checkpoint = None
+        self.rejects = None
+        self.loaded_records = 0
+        self.loaded_tests = 0
+
+    def create_tables(self):
+        cursor = self.connection.cursor()
+        for table, columns in ((RECORDS_TABLE, RECORD_COLUMNS), (TESTINFO_TABLE, TESTINFO_COLUMNS)):
+            column_sql = ", ".join(f'"{name}" {sql_type}' for name, sql_type in columns)
+            key_sql = ", ".join(f'"{name}"' for name in TABLE_KEYS[table])
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({column_sql}, PRIMARY KEY ({key_sql}))")
+        self.connection.commit()
+
+    def conflict_sql(self, table, columns):
+        """ON CONFLICT clause replacing the non-key columns of an existing row (empty without upsert)."""
+        if not self.upsert:
+            return ""
+        key = TABLE_KEYS[table]
+        key_sql = ", ".join(f'"{name}"' for name in key)
+        updates = ", ".join(f'"{name}" = excluded."{name}"' for name, _ in columns if name not in key)
+        return f" ON CONFLICT ({key_sql}) DO UPDATE SET {updates}"
+
+    def insert_sql(self, table, columns, rows):
+        """Multi-row INSERT (or upsert) for `rows` rows."""
+        names = ", ".join(f'"{name}"' for name, _ in columns)
+        row_sql = "(" + ", ".join([self.placeholder] * len(columns)) + ")"
+        return (f"INSERT INTO {table} ({names}) VALUES " + ", ".join([row_sql] * rows)
+                + self.conflict_sql(table, columns))
+
+    def delete_tests(self, cursor, keys):
+        """Drop the stored testinfo rows of the given record keys, so replaced records keep no stale tests."""
+        names = ", ".join(f'"{name}"' for name in KEY_COLUMNS)
+        if self.dialect == "sqlite":
+            # SQLite scans the table for a row-value IN list but probes the primary key per statement,
+            # and executemany runs those probes without a round trip each.
+            cursor.executemany(f"DELETE FROM {TESTINFO_TABLE} WHERE "
+                               + " AND ".join(f'"{name}" = ?' for name in KEY_COLUMNS), keys)
+            return
+        per_statement = self.rows_per_statement
+        row_sql = "(" + ", ".join([self.placeholder] * len(KEY_COLUMNS)) + ")"
+        for start in range(0, len(keys), per_statement):
+            chunk = keys[start:start + per_statement]
+            cursor.execute(f"DELETE FROM {TESTINFO_TABLE} WHERE ({names}) IN (VALUES "
+                           + ", ".join([row_sql] * len(chunk)) + ")", [value for key in chunk for value in key])
+
+    def statement_rows(self, columns):
+        if self.dialect == "sqlite":
+            return max(1, min(self.rows_per_statement, SQLITE_MAX_VARIABLES // len(columns)))
+        return self.rows_per_statement
+
+    def insert_rows(self, cursor, table, columns, rows):
+        if not rows:
+            return
+        if self.use_copy:
+            self.copy_rows(cursor, table, columns, rows)
+            return
+        per_statement = self.statement_rows(columns)
+        full_sql = self.insert_sql(table, columns, per_statement)
+        for start in range(0, len(rows), per_statement):
+            chunk = rows[start:start + per_statement]
+            sql = full_sql if len(chunk) == per_statement else self.insert_sql(table, columns, len(chunk))
+            cursor.execute(sql, [value for row in chunk for value in row])
+
+    def copy_rows(self, cursor, table, columns, rows):
+        """Stream the rows as CSV through COPY ... FROM STDIN (psycopg2).
+
+        COPY cannot resolve conflicts, so for upserts the rows are copied into a temporary staging table and
+        moved over with a single INSERT ... SELECT ... ON CONFLICT.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["\\N" if value is None else value for value in row])
+        buffer.seek(0)
+        names = ", ".join(f'"{name}"' for name, _ in columns)
+        target = table
+        if self.upsert:
+            target = f"{table}_staging"
+            cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {target} (LIKE {table}) ON COMMIT DELETE ROWS")
+        cursor.copy_expert(f"COPY {target} ({names}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+        if self.upsert:
+            cursor.execute(f"INSERT INTO {table} ({names}) SELECT {names} FROM {target}"
+                           + self.conflict_sql(table, columns))
+
+    def load_transaction(self, records):
+        """Insert one transaction's worth of records and commit; rolls back on error."""
+        rows = {}
+        for record in records:
+            parent, tests = record_rows(record)
+            rows[parent[:len(KEY_COLUMNS)] if self.upsert else len(rows)] = (parent, tests)  # last one wins
+        parents = [parent for parent, _ in rows.values()]
+        children = [test for _, tests in rows.values() for test in tests]
+        cursor = self.connection.cursor()
+        try:
+            self.insert_rows(cursor, RECORDS_TABLE, RECORD_COLUMNS, parents)
+            if self.upsert:
+                self.delete_tests(cursor, list(rows))
+            self.insert_rows(cursor, TESTINFO_TABLE, TESTINFO_COLUMNS, children)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        self.loaded_records += len(records)
+        self.loaded_tests += len(children)
+
+    def transactions(self, source):
+        """Yield (start, end, records) for up to `transaction_records` uncommitted records at a time.
+
+        Every index in [start, end) is one of the records, a record committed by an earlier run or a rejected
+        one (acknowledged already), so the whole range can be acknowledged once the transaction commits.
+        """
+        records, start = [], None
+        for index, record in enumerate(source):
+            if self.checkpoint.is_acked(index):
+                continue
+            reasons = self.check(record)
+            if reasons:
+                self.reject(index, record, reasons)
+                continue
+            if not records:
+                start = index
+            records.append(record)
+            if len(records) >= self.transaction_records:
+                yield start, index + 1, records
+                records = []
+        if records:
+            yield start, index + 1, records
+
+    def check(self, record):
+        """None if the record can be loaded, else the reasons it is rejected."""
+        if self.validator is not None:
+            reasons = self.validator.validate(record)
+            if reasons:
+                return reasons
+        if type(record) is not dict:
+            return ["record: not an object"]
+        return missing_keys(record)
+
+    def reject(self, index, record, reasons):
+        self.rejects.write(index, record, reasons)
+        self.checkpoint.ack(index, index + 1, persist=False)  # written with the next transaction's ack
+        self.loaded_records += 1
+
+    def load(self, source, total_records=0, checkpoint_target=CHECKPOINT_TARGET):
+        """Load every record of a RecordSource not committed by an earlier run; returns True if complete."""
+        self.checkpoint = SendCheckpoint(source.path, checkpoint_target)
+        resumed_records = self.checkpoint.load()
+        if resumed_records:
+            self.log(f"Resuming: {resumed_records} records were already committed.")
+        self.loaded_records, self.loaded_tests = resumed_records, 0
+        self.rejects = RejectFile(f"{source.path}{REJECT_SUFFIX}", append=bool(resumed_records))
+        started = time.perf_counter()
+        try:
+            for start, end, records in self.transactions(source):
+                if self.abort_event.is_set():
+                    self.log("Abort flag set. Halting further database transactions. "
+                             "Loading the file again resumes here.")
+                    return False
+                self.load_transaction(records)
+                self.checkpoint.ack(start, end)
+                if self.on_progress is not None:
+                    self.on_progress(self.loaded_records, total_records)
+        finally:
+            self.rejects.close()
+            self.checkpoint.persist()
+            if self.rejects.rejected:
+                self.log(f"{self.rejects.rejected} invalid records were not loaded; see {self.rejects.path}.",
+                         log_to_error_file=True)
+        self.checkpoint.clear()
+        elapsed = time.perf_counter() - started
+        loaded = self.loaded_records - resumed_records - self.rejects.rejected
+        self.log(f"Loaded {loaded} records and {self.loaded_tests} testinfo rows in {elapsed:.1f} s "
+                 f"({loaded / max(elapsed, 1e-9):.0f} records/s).")
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load a JSON/JSONL jot file into a local SQLite database.")
+    parser.add_argument("file")
+    parser.add_argument("--sqlite", default="jots.sqlite", help="database file")
+    parser.add_argument("--transaction-records", type=int, default=TRANSACTION_RECORDS)
+    parser.add_argument("--rows-per-statement", type=int, default=ROWS_PER_STATEMENT)
+    parser.add_argument("--insert-only", action="store_true", help="plain INSERT instead of upsert")
+    parser.add_argument("--validate", action="store_true", help="check records against the record schema first")
+    parser.add_argument("--sql-trace", type=float, metavar="RATE",
+                        help="trace statements, logging this share of them at DEBUG")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    connection = sqlite3.connect(args.sqlite)
+    tracer = SQLTracer(sample_rate=args.sql_trace) if args.sql_trace is not None else None
+    try:
+        target = connection if tracer is None else TracedConnection(connection, tracer)
+        loader = BulkLoader(target, "sqlite", args.transaction_records, args.rows_per_statement,
+                            upsert=not args.insert_only, validator=RecordValidator() if args.validate else None)
+        loader.create_tables()
+        loader.load(RecordSource(args.file), checkpoint_target=f"sqlite_{os.path.basename(args.sqlite)}")
+        if tracer is not None:
+            tracer.log_summary(logging.info)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
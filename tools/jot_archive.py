@@ -0,0 +1,85 @@
+import os
+import tarfile
+import time
+import zipfile
+from datetime import datetime
+
+MEMBER_SEPARATOR = "!"  # manifest/job path of a member: "<archive>!<member name>"
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def is_archive(path):
+    """True for a .zip or .tar[.gz|.bz2|.xz] file (checked by content, not just by name)."""
+    if not os.path.isfile(path):
+        return False
+    return zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+
+
+def member_path(archive, name):
+    return f"{archive}{MEMBER_SEPARATOR}{name}"
+
+
+def _is_jot(name):
+    return name.lower().endswith(".xml")
+
+
+def _zip_mtime_ns(info):
+    return int(datetime(*info.date_time).timestamp() * 1e9)
+
+
+def _iter_zip(path):
+    """(name, size, mtime_ns, open member) for the XML members of a zip, in central directory order."""
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and _is_jot(info.filename):
+                yield info.filename, info.file_size, _zip_mtime_ns(info), lambda info=info: archive.read(info)
+
+
+def _iter_tar(path):
+    """Same for a tar, opened as a forward-only stream so compressed tars are decompressed exactly once."""
+    with tarfile.open(path, "r|*") as archive:
+        for info in archive:
+            if info.isfile() and _is_jot(info.name):
+                yield info.name, info.size, int(info.mtime * 1e9), lambda info=info: archive.extractfile(info).read()
+
+
+def _iter_members(path):
+    return _iter_zip(path) if zipfile.is_zipfile(path) else _iter_tar(path)
+
+
+def count_archive_jots(path, manifest=None, abort_event=None):
+    """(files, bytes) of the XML members not yet in the manifest; reads no member data for zips.
+
+    Stops early, with the counts so far, once `abort_event` is set.
+    """
+    files = total_bytes = 0
+    for name, size, mtime_ns, _ in _iter_members(path):
+        if abort_event is not None and abort_event.is_set():
+            break
+        if manifest is not None and manifest.is_unchanged(member_path(path, name), size, mtime_ns):
+            continue
+        files += 1
+        total_bytes += size
+    return files, total_bytes
+
+
+def iter_archive_jobs(path, manifest=None, metrics=None):
+    """Stream (member path, size, mtime_ns, data, read error) jobs for the XML members of a zip or tar archive.
+
+    Members are read one at a time in the calling thread, so the bounded submission window in front of the
+    workers also bounds how much member data is held in memory. Reading (and decompressing) a member is
+    recorded as the discovery stage; the workers then parse from memory.
+    """
+    started = time.perf_counter()
+    for name, size, mtime_ns, read in _iter_members(path):
+        job_path = member_path(path, name)
+        if manifest is not None and manifest.is_unchanged(job_path, size, mtime_ns):
+            continue
+        try:
+            data, error = read(), None
+        except Exception as e:  # corrupt member (bad CRC, truncated stream); report it like a parse error
+            data, error = None, f"cannot read archive member: {e}"
+        if metrics is not None:
+            metrics.record("discovery", time.perf_counter() - started, size)
+        yield job_path, size, mtime_ns, data, error
+        started = time.perf_counter()
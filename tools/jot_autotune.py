@@ -0,0 +1,67 @@
+import time
+
+WINDOW_SECONDS = 3.0  # measure the rate over at least this long before deciding
+WINDOW_MIN_FILES = 100  # ... and over at least this many finished files
+TOLERANCE = 0.05  # rate changes within +-5% count as noise
+STEP_FRACTION = 0.25  # change concurrency by 25% of its current value (at least 1) per step
+
+
+class ConcurrencyTuner:
+    """Hill-climbs the number of concurrently running parse tasks toward the best byte throughput.
+
+    After every measurement window the rate is compared with the previous window's: a clear gain keeps going
+    in the same direction, a clear loss turns around, and no significant change moves toward fewer workers,
+    since they did not buy anything. The climber therefore settles just above the knee of the curve and keeps
+    probing around it, following changes such as a share slowing down mid-run.
+    """
+
+    def __init__(self, initial, maximum, minimum=1, log=None, window_seconds=WINDOW_SECONDS,
+                 window_min_files=WINDOW_MIN_FILES):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.concurrency = min(self.maximum, max(self.minimum, initial))
+        self.log = log
+        self.window_seconds = window_seconds
+        self.window_min_files = window_min_files
+        self.direction = 1
+        self.previous_rate = None
+        self.best = (0.0, self.concurrency)  # (bytes/s, concurrency) of the best window seen
+        self.adjustments = 0
+        self._window = None
+
+    def resume(self, bytes_done, files_done):
+        """Start a fresh window, e.g. after the pipeline sat idle between watch cycles."""
+        self._window = (time.perf_counter(), bytes_done, files_done)
+
+    def observe(self, bytes_done, files_done):
+        """Feed the running totals; returns True when the concurrency was changed."""
+        now = time.perf_counter()
+        if self._window is None:
+            self._window = (now, bytes_done, files_done)
+            return False
+        started, start_bytes, start_files = self._window
+        elapsed = now - started
+        if elapsed < self.window_seconds or files_done - start_files < self.window_min_files:
+            return False
+        rate = (bytes_done - start_bytes) / elapsed
+        self._window = (now, bytes_done, files_done)
+        if rate > self.best[0]:
+            self.best = (rate, self.concurrency)
+        previous_rate, self.previous_rate = self.previous_rate, rate
+        if previous_rate is not None:
+            if rate < previous_rate * (1 - TOLERANCE):
+                self.direction = -self.direction
+            elif rate <= previous_rate * (1 + TOLERANCE):
+                self.direction = -1
+        step = max(1, round(self.concurrency * STEP_FRACTION))
+        target = min(self.maximum, max(self.minimum, self.concurrency + self.direction * step))
+        if target == self.concurrency:
+            self.direction = -self.direction  # pinned at a bound; probe the other way next time
+            return False
+        if self.log is not None:
+            previous = f" (previous window {previous_rate / 1e6:.2f} MB/s)" if previous_rate is not None else ""
+            self.log(f"Autotune: {rate / 1e6:.2f} MB/s with {self.concurrency} workers{previous}; "
+                     f"trying {target}.")
+        self.concurrency = target
+        self.adjustments += 1
+        return True
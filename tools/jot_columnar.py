@@ -0,0 +1,112 @@
+import time
+from pathlib import Path
+
+from record_codec import TEST_ROW_FIELDS, as_bool, as_int, as_number, as_text, test_row
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # columnar output is optional
+    pa = pq = None
+
+PARQUET_CODECS = {"none": "none", "gzip": "gzip", "lzma": "zstd"}  # Parquet has no xz codec; zstd is closest
+
+RECORD_COLUMNS = (
+    ("sn", "string"),
+    ("origin", "string"),
+    ("ItemNr", "string"),
+    ("WorkPlan", "string"),
+    ("WorkPlanIndex", "int64"),
+    ("bom_name", "string"),
+    ("bom_index", "int64"),
+    ("serie", "string"),
+    ("timestamp", "string"),
+    ("verification", "bool_"),
+    ("comment", "string"),
+    ("status", "string"),
+    ("test_count", "int32"),
+)
+TESTINFO_COLUMNS = (
+    ("sn", "string"),
+    ("timestamp", "string"),
+    ("test_index", "int32"),
+    ("id", "string"),  # from here on, TEST_ROW_FIELDS in order
+    ("description", "string"),
+    ("value", "float64"),  # numeric and boolean values; booleans as 1.0/0.0
+    ("value_text", "string"),  # values that are not numbers
+    ("limit_low", "float64"),
+    ("limit_high", "float64"),
+    ("unit", "string"),
+    ("ok", "bool_"),
+)
+
+
+def columnar_available():
+    return pa is not None
+
+
+def _schema(columns):
+    return pa.schema([(name, getattr(pa, type_name)()) for name, type_name in columns])
+
+
+assert tuple(name for name, _ in TESTINFO_COLUMNS[3:]) == TEST_ROW_FIELDS
+
+_CONVERT = {"string": as_text, "int64": as_int, "int32": as_int, "bool_": as_bool, "float64": as_number}
+
+
+class ParquetOutput:
+    """Per-origin columnar output: a records table plus a testinfo child table keyed by sn (and timestamp).
+
+    Files are `<stem>.records.parquet` and `<stem>.testinfo.parquet`; every written batch becomes one row
+    group, so readers can pull just the columns they aggregate without re-parsing nested JSON. Parquet files
+    are only readable once their footer is written on close, hence `durable_on_flush = False`.
+    """
+
+    durable_on_flush = False
+
+    def __init__(self, path, compression="none", origin=None):
+        if pa is None:
+            raise RuntimeError("Parquet output needs the optional 'pyarrow' package.")
+        stem = Path(path).with_suffix("")
+        self.origin = origin
+        self.records_path = Path(f"{stem}.records.parquet")
+        self.testinfo_path = Path(f"{stem}.testinfo.parquet")
+        self.record_schema = _schema(RECORD_COLUMNS)
+        self.testinfo_schema = _schema(TESTINFO_COLUMNS)
+        codec = PARQUET_CODECS.get(compression, "zstd")
+        self.records_writer = pq.ParquetWriter(self.records_path, self.record_schema, compression=codec)
+        self.testinfo_writer = pq.ParquetWriter(self.testinfo_path, self.testinfo_schema, compression=codec)
+        self.serialize_seconds = 0.0  # read by the writer pool to split serialize from write time
+
+    def write_all(self, records):
+        """Append one row group to each table; returns [(records file, count)]."""
+        started = time.perf_counter()
+        parent = {name: [] for name, _ in RECORD_COLUMNS}
+        child = {name: [] for name, _ in TESTINFO_COLUMNS}
+        record_converters = [(name, _CONVERT[type_name]) for name, type_name in RECORD_COLUMNS[:-1]]
+        for record in records:
+            for name, convert in record_converters:
+                parent[name].append(convert(record.get(name)))
+            tests = record.get("testinfo") or []
+            parent["test_count"].append(len(tests))
+            sn, timestamp = as_text(record.get("sn")), as_text(record.get("timestamp"))
+            for index, test in enumerate(tests):
+                child["sn"].append(sn)
+                child["timestamp"].append(timestamp)
+                child["test_index"].append(index)
+                for name, value in zip(TEST_ROW_FIELDS, test_row(test)):
+                    child[name].append(value)
+        parent_table = pa.Table.from_pydict(parent, schema=self.record_schema)
+        child_table = pa.Table.from_pydict(child, schema=self.testinfo_schema) if child["sn"] else None
+        self.serialize_seconds += time.perf_counter() - started
+        self.records_writer.write_table(parent_table)
+        if child_table is not None:
+            self.testinfo_writer.write_table(child_table)
+        return [(self.records_path, len(records))]
+
+    def flush(self):
+        pass  # row groups are written as they come; the footer only exists after close()
+
+    def close(self):
+        self.records_writer.close()
+        self.testinfo_writer.close()
@@ -0,0 +1,145 @@
+import argparse
+import json
+import math
+import os
+import random
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+SIZE_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+UNITS = ("V", "A", "mA", "Ohm", "s", "---")
+
+
+def parse_origin_mix(text):
+    """'supplier:0.7,inhouse:0.3' -> ([origins], [weights])."""
+    origins, weights = [], []
+    for part in text.split(","):
+        name, _, weight = part.partition(":")
+        origins.append(name.strip())
+        weights.append(float(weight) if weight else 1.0)
+    return origins, weights
+
+
+def test_count(rng, distribution, mean, maximum):
+    """Number of <test> entries for one jot, i.e. its testinfo depth and therefore its size."""
+    if distribution == "fixed":
+        count = mean
+    elif distribution == "uniform":
+        count = rng.randint(0, 2 * mean)
+    else:  # lognormal: mostly small jots with a long tail of huge ones, like production
+        sigma = 1.0
+        count = int(rng.lognormvariate(math.log(max(mean, 1)) - sigma ** 2 / 2, sigma))
+    return max(0, min(maximum, count))
+
+
+def render_jot(rng, sn, origin, timestamp, tests):
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        f'<jot origin="{escape(origin)}">',
+        f"  <sn>{sn}</sn>",
+        f"  <ItemNr>{rng.randint(10000, 99999)}</ItemNr>",
+        f"  <WorkPlan>A{rng.randint(1, 20):03d}</WorkPlan>",
+        f"  <WorkPlanIndex>{rng.randint(0, 5)}</WorkPlanIndex>",
+        f"  <bom_name>{rng.randint(10000, 99999)}</bom_name>",
+        f"  <bom_index>{rng.randint(0, 3)}</bom_index>",
+        "  <serie>none</serie>",
+        f"  <timestamp>{timestamp.isoformat(timespec='seconds')}</timestamp>",
+        f"  <verification>{'true' if rng.random() < 0.95 else 'false'}</verification>",
+        "  <comment/>",
+        "  <status>Active</status>",
+        "  <tests>",
+    ]
+    for index in range(tests):
+        low = round(rng.uniform(0, 10), 3)
+        high = round(low + rng.uniform(0.1, 5), 3)
+        value = round(rng.uniform(low - 0.5, high + 0.5), 4)
+        ok = low <= value <= high
+        lines.append(
+            f'    <test id="T{index:04d}"><description>Measurement {index}</description>'
+            f"<limits>{low};{high}</limits><value>{value}</value><unit>{rng.choice(UNITS)}</unit>"
+            f"<ok>{'true' if ok else 'false'}</ok></test>")
+    lines += ["  </tests>", "</jot>", ""]
+    return "\n".join(lines)
+
+
+def generate_corpus(folder, files, origin_mix="supplier:0.7,inhouse:0.3", tests_mean=20, tests_max=2000,
+                    size_distribution="lognormal", duplicate_rate=0.0, seed=0):
+    """Write `files` jot XML files to `folder`; returns (files written, total bytes).
+
+    `duplicate_rate` re-uses an earlier serial number for that share of the jots (re-jotted parts).
+    """
+    rng = random.Random(seed)
+    origins, weights = parse_origin_mix(origin_mix)
+    os.makedirs(folder, exist_ok=True)
+    start = datetime(2024, 1, 1)
+    total_bytes = 0
+    for index in range(files):
+        if index and rng.random() < duplicate_rate:
+            sn = str(1000000000 + rng.randrange(index))
+        else:
+            sn = str(1000000000 + index)
+        origin = rng.choices(origins, weights)[0]
+        timestamp = start + timedelta(seconds=index * 17 + rng.randint(0, 16))
+        tests = test_count(rng, size_distribution, tests_mean, tests_max)
+        data = render_jot(rng, sn, origin, timestamp, tests).encode("utf-8")
+        with open(os.path.join(folder, f"jot_{index:08d}.xml"), "wb") as f:
+            f.write(data)
+        total_bytes += len(data)
+    return files, total_bytes
+
+
+def generate_jsonl(path, records, origin_mix="supplier:0.7,inhouse:0.3", tests_mean=20, tests_max=2000,
+                   size_distribution="lognormal", seed=0):
+    """Write `records` converted jot records (the shape xml2json2 emits) to a JSONL file; returns total bytes."""
+    rng = random.Random(seed)
+    origins, weights = parse_origin_mix(origin_mix)
+    start = datetime(2024, 1, 1)
+    total_bytes = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for index in range(records):
+            tests = []
+            for test in range(test_count(rng, size_distribution, tests_mean, tests_max)):
+                low = round(rng.uniform(0, 10), 3)
+                high = round(low + rng.uniform(0.1, 5), 3)
+                value = round(rng.uniform(low - 0.5, high + 0.5), 4)
+                tests.append({"id": f"T{test:04d}", "description": f"Measurement {test}", "limits": [low, high],
+                              "value": value, "unit": rng.choice(UNITS), "ok": low <= value <= high})
+            record = {
+                "sn": str(1000000000 + index),
+                "origin": rng.choices(origins, weights)[0],
+                "ItemNr": str(rng.randint(10000, 99999)),
+                "WorkPlan": f"A{rng.randint(1, 20):03d}",
+                "WorkPlanIndex": rng.randint(0, 5),
+                "bom_name": str(rng.randint(10000, 99999)),
+                "bom_index": rng.randint(0, 3),
+                "serie": "none",
+                "timestamp": (start + timedelta(seconds=index * 17)).isoformat(timespec="seconds"),
+                "verification": rng.random() < 0.95,
+                "comment": "",
+                "status": "Active",
+                "testinfo": tests,
+            }
+            line = json.dumps(record, ensure_ascii=False) + "\n"
+            f.write(line)
+            total_bytes += len(line)
+    return total_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic jot XML corpus.")
+    parser.add_argument("folder")
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--origins", default="supplier:0.7,inhouse:0.3", help="name:weight,...")
+    parser.add_argument("--tests-mean", type=int, default=20, help="mean number of <test> entries per jot")
+    parser.add_argument("--tests-max", type=int, default=2000)
+    parser.add_argument("--size-dist", choices=SIZE_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="share of jots re-using an earlier sn")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    files, total_bytes = generate_corpus(args.folder, args.files, args.origins, args.tests_mean, args.tests_max,
+                                         args.size_dist, args.duplicates, args.seed)
+    print(f"Wrote {files} jots ({total_bytes / 1e6:.1f} MB) to {args.folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+
+from record_codec import make_encoder
+
+DEDUP_MODES = ("off", "sn_timestamp", "sn_latest")
+DEDUP_INDEXES = ("memory", "disk")
+DEDUP_INDEX_FILE = "xml2json_dedup.sqlite"
+DISK_COMMIT_INTERVAL = 10000  # index inserts per SQLite transaction
+
+
+def dedup_key(*parts):
+    """64-bit key for the identifying fields; far smaller than the strings themselves.
+
+    The chance of two different keys colliding stays below one in a million up to ~6 million distinct keys.
+    """
+    digest = hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)  # signed so it fits an SQLite INTEGER
+
+
+class MemoryDedupIndex:
+    """Keys in a set (sn_timestamp) or key -> (timestamp, entry, spool offset, length) of the newest record in
+    a dict (sn_latest).
+
+    The held records themselves are appended to an unnamed temporary file (in `directory`), so memory only
+    grows with the number of distinct serials; a replaced record just leaves its bytes behind in the file.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.seen = set()
+        self.latest = {}
+        self.spool = None
+        self.encode = make_encoder()[1]
+
+    def add(self, key):
+        """True if the key is new."""
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        return True
+
+    def hold(self, key, timestamp, record, entry):
+        """Hold the record if `timestamp` is newer than any seen for the key.
+
+        Returns (held, replaced an earlier record, entry of that record).
+        """
+        known = self.latest.get(key)
+        if known is not None and known[0] >= timestamp:
+            return False, False, None
+        if self.spool is None:
+            self.spool = tempfile.TemporaryFile(dir=self.directory)
+        line = self.encode(record)
+        offset = self.spool.seek(0, os.SEEK_END)
+        self.spool.write(line)
+        self.latest[key] = (timestamp, entry, offset, len(line))
+        return True, known is not None, None if known is None else known[1]
+
+    def held(self):
+        """(record, entry) of every held record, read back in spool order."""
+        if self.spool is None:
+            return
+        self.spool.flush()
+        for _, entry, offset, length in sorted(self.latest.values(), key=lambda held: held[2]):
+            self.spool.seek(offset)
+            yield json.loads(self.spool.read(length)), entry  # stdlib: keeps integers orjson would turn to floats
+
+    def __len__(self):
+        return len(self.seen) + len(self.latest)
+
+    def close(self):
+        self.seen.clear()
+        self.latest.clear()
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+
+def _entry(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+class DiskDedupIndex:
+    """SQLite-backed index for runs with more distinct serials than fit comfortably in memory.
+
+    The index only lives for one run; its file is removed on close.
+    """
+
+    def __init__(self, db_path=DEDUP_INDEX_FILE):
+        self.db_path = db_path
+        self.pending = 0
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA journal_mode=OFF")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute("DROP TABLE IF EXISTS seen")
+        self.connection.execute("CREATE TABLE seen (key INTEGER PRIMARY KEY, timestamp TEXT, record TEXT, entry TEXT)"
+                                " WITHOUT ROWID")
+
+    def _changed(self, cursor):
+        self.pending += 1
+        if self.pending >= DISK_COMMIT_INTERVAL:
+            self.connection.commit()
+            self.pending = 0
+        return cursor.rowcount > 0
+
+    def add(self, key):
+        return self._changed(self.connection.execute("INSERT OR IGNORE INTO seen (key) VALUES (?)", (key,)))
+
+    def hold(self, key, timestamp, record, entry):
+        known = self.connection.execute("SELECT timestamp, entry FROM seen WHERE key = ?", (key,)).fetchone()
+        if known is not None and known[0] >= timestamp:
+            return False, False, None
+        self._changed(self.connection.execute(
+            "INSERT OR REPLACE INTO seen (key, timestamp, record, entry) VALUES (?, ?, ?, ?)",
+            (key, timestamp, json.dumps(record, ensure_ascii=False), json.dumps(entry))))
+        return True, known is not None, None if known is None else _entry(json.loads(known[1]))
+
+    def held(self):
+        self.connection.commit()
+        # A second connection, so the rows can be streamed while the first one stays usable.
+        reader = sqlite3.connect(self.db_path)
+        try:
+            for record, entry in reader.execute("SELECT record, entry FROM seen WHERE record IS NOT NULL"):
+                yield json.loads(record), _entry(json.loads(entry))
+        finally:
+            reader.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+        try:
+            os.remove(self.db_path)
+        except OSError:
+            pass
+
+
+class JotDeduplicator:
+    """Drops records whose serial number was already seen in this run, before they reach the writers.
+
+    `sn_timestamp` keeps the first record of every (sn, timestamp) pair, i.e. drops exact re-jots.
+    `sn_latest` keeps only the newest record of every sn, whatever order they arrive in: the current winner of
+    each sn is held in the index (the records themselves in a temporary file next to it) and handed out by
+    `held()` once the run has seen every jot. Timestamps are compared as ISO 8601 text, a missing one counts
+    as oldest; of equal ones the first seen wins. Records without an sn are always kept and written right away.
+    """
+
+    def __init__(self, mode="sn_timestamp", index="memory", index_path=DEDUP_INDEX_FILE):
+        if mode not in DEDUP_MODES[1:]:
+            raise ValueError(f"Unknown dedup mode: {mode}")
+        self.mode = mode
+        self.index = (DiskDedupIndex(index_path) if index == "disk"
+                      else MemoryDedupIndex(os.path.dirname(index_path) or None))
+        self.kept = 0
+        self.dropped = 0
+
+    def check(self, record, entry=None):
+        """Returns (write now, entry of a record dropped as a duplicate or None).
+
+        `entry` is the caller's bookkeeping for the record (e.g. its manifest entry) and comes back once the
+        record is dropped: right away for a duplicate, or later when a held sn_latest record is replaced.
+        """
+        sn = record.get("sn")
+        if sn is None or sn == "":
+            self.kept += 1
+            return True, None
+        timestamp = str(record.get("timestamp") or "")
+        if self.mode == "sn_timestamp":
+            if self.index.add(dedup_key(str(sn), timestamp)):
+                self.kept += 1
+                return True, None
+            self.dropped += 1
+            return False, entry
+        held, replaced, replaced_entry = self.index.hold(dedup_key(str(sn)), timestamp, record, entry)
+        if not held:
+            self.dropped += 1
+            return False, entry
+        if replaced:
+            self.dropped += 1
+        else:
+            self.kept += 1
+        return False, replaced_entry
+
+    def held(self):
+        """(record, entry) of the newest record of every sn (sn_latest); call once all records were checked."""
+        if self.mode == "sn_latest":
+            yield from self.index.held()
+
+    def close(self):
+        self.index.close()
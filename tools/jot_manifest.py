@@ -0,0 +1,71 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+MANIFEST_FILE = "xml2json_manifest.sqlite"
+
+
+class JotManifest:
+    """Persistent record of processed jots, so re-runs only parse new or changed files.
+
+    Each row holds the file's path, size, mtime and content hash plus the origin output it was written to.
+    The SQLite connection is shared between the collecting thread and the writer, hence the lock.
+    """
+
+    def __init__(self, db_path=MANIFEST_FILE):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS jots ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " hash TEXT NOT NULL,"
+            " origin TEXT,"
+            " output TEXT,"
+            " processed_at TEXT)"
+        )
+        self.connection.commit()
+
+    def lookup(self, path):
+        """Return (size, mtime_ns, hash) for a known file, or None."""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT size, mtime_ns, hash FROM jots WHERE path = ?", (path,)).fetchone()
+
+    def is_unchanged(self, path, size, mtime_ns):
+        """Cheap check on size and mtime only; no file content is read."""
+        row = self.lookup(path)
+        return row is not None and row[0] == size and row[1] == mtime_ns
+
+    def has_content(self, path, digest):
+        """True if the file was already processed with exactly this content (e.g. it was only touched)."""
+        row = self.lookup(path)
+        return row is not None and row[2] == digest
+
+    def touch(self, path, size, mtime_ns):
+        """Refresh the stat fields of a file whose content did not change."""
+        with self.lock:
+            self.connection.execute("UPDATE jots SET size = ?, mtime_ns = ? WHERE path = ?", (size, mtime_ns, path))
+            self.connection.commit()
+
+    def record_many(self, entries, origin, output):
+        """Store (path, size, mtime_ns, hash) entries once their records have been written to `output`.
+
+        `origin` and `output` are None for jots whose record was dropped as a duplicate.
+        """
+        processed_at = datetime.now().isoformat(timespec="seconds")
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO jots (path, size, mtime_ns, hash, origin, output, processed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(path, size, mtime_ns, digest, origin, None if output is None else str(output), processed_at)
+                 for path, size, mtime_ns, digest in entries])
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
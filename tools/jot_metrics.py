@@ -0,0 +1,183 @@
+import json
+import math
+import os
+import threading
+import time
+
+STAGES = ("discovery", "read", "parse", "serialize", "write")
+EWMA_ALPHA = 0.3  # weight of the newest rate sample; lower = smoother ETA
+
+
+class Histogram:
+    """Log2-bucketed histogram of durations in seconds (bucket i holds values below 2**i microseconds)."""
+
+    BUCKETS = 32  # 1 µs .. ~35 min
+    SCALE = 1e6  # bucket units per value unit
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, seconds):
+        index = min(self.BUCKETS - 1, max(0, int(seconds * self.SCALE).bit_length()))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples."""
+        if not self.count:
+            return 0.0
+        threshold = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= threshold:
+                return min(self.max, (2 ** index) / self.SCALE)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 6),
+            "mean_s": round(self.total / self.count, 6) if self.count else 0.0,
+            "min_s": round(self.min, 6) if self.count else 0.0,
+            "max_s": round(self.max, 6),
+            "p50_s": round(self.percentile(0.5), 6),
+            "p99_s": round(self.percentile(0.99), 6),
+            "buckets_us": {f"<{2 ** i}": c for i, c in enumerate(self.counts) if c},
+        }
+
+
+class CountHistogram(Histogram):
+    """Log2-bucketed histogram of counts such as rows per statement (bucket i holds values below 2**i)."""
+
+    SCALE = 1
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "total": int(self.total),
+            "mean": round(self.total / self.count, 1) if self.count else 0.0,
+            "max": int(self.max),
+            "p50": int(self.percentile(0.5)),
+            "p99": int(self.percentile(0.99)),
+            "buckets": {f"<{2 ** i}": c for i, c in enumerate(self.counts) if c},
+        }
+
+
+class PipelineMetrics:
+    """Thread-safe per-stage counters and timing histograms plus an EWMA-smoothed throughput and ETA.
+
+    The ETA is based on bytes rather than files, so a run that starts with tiny jots and ends with huge ones
+    does not promise a finish time it cannot keep.
+    """
+
+    def __init__(self, stages=STAGES):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.histograms = {stage: Histogram() for stage in stages}
+        self.bytes = {stage: 0 for stage in stages}
+        self.concurrency = {stage: 1 for stage in stages}
+        self.total_files = 0
+        self.total_bytes = 0
+        self.files_done = 0
+        self.bytes_done = 0
+        self.errors = 0
+        self.ewma_files_rate = None
+        self.ewma_bytes_rate = None
+        self._last_tick = (self.started, 0, 0)
+
+    def set_concurrency(self, stage, workers):
+        """Number of workers serving a stage; used to turn busy time into utilization."""
+        with self.lock:
+            self.concurrency[stage] = max(1, workers)
+
+    def set_totals(self, files, size):
+        with self.lock:
+            self.total_files = files
+            self.total_bytes = size
+
+    def record(self, stage, seconds, size=0):
+        with self.lock:
+            self.histograms[stage].add(seconds)
+            self.bytes[stage] += size
+
+    def file_done(self, size, error=False):
+        with self.lock:
+            self.files_done += 1
+            self.bytes_done += size
+            self.errors += bool(error)
+
+    def tick(self):
+        """Fold the rate since the last tick into the EWMA; call periodically (e.g. from the progress timer)."""
+        with self.lock:
+            now = time.perf_counter()
+            last_time, last_files, last_bytes = self._last_tick
+            elapsed = now - last_time
+            if elapsed <= 0:
+                return
+            files_rate = (self.files_done - last_files) / elapsed
+            bytes_rate = (self.bytes_done - last_bytes) / elapsed
+            if self.ewma_files_rate is None:
+                self.ewma_files_rate, self.ewma_bytes_rate = files_rate, bytes_rate
+            else:
+                self.ewma_files_rate += EWMA_ALPHA * (files_rate - self.ewma_files_rate)
+                self.ewma_bytes_rate += EWMA_ALPHA * (bytes_rate - self.ewma_bytes_rate)
+            self._last_tick = (now, self.files_done, self.bytes_done)
+
+    def eta_seconds(self):
+        with self.lock:
+            if self.total_bytes and self.ewma_bytes_rate:
+                return max(0.0, (self.total_bytes - self.bytes_done) / self.ewma_bytes_rate)
+            if self.total_files and self.ewma_files_rate:
+                return max(0.0, (self.total_files - self.files_done) / self.ewma_files_rate)
+            return None
+
+    def utilization(self):
+        """Share of the available worker time each stage was busy; the highest one is the bottleneck."""
+        elapsed = max(1e-9, time.perf_counter() - self.started)
+        with self.lock:
+            return {stage: hist.total / (elapsed * self.concurrency[stage])
+                    for stage, hist in self.histograms.items()}
+
+    def bottleneck(self):
+        utilization = self.utilization()
+        stage = max(utilization, key=utilization.get)
+        return stage, utilization[stage]
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        utilization = self.utilization()
+        eta = self.eta_seconds()
+        with self.lock:
+            return {
+                "elapsed_s": round(elapsed, 3),
+                "total_files": self.total_files,
+                "total_bytes": self.total_bytes,
+                "files_done": self.files_done,
+                "bytes_done": self.bytes_done,
+                "errors": self.errors,
+                "files_per_s": round(self.files_done / elapsed, 3) if elapsed else 0.0,
+                "bytes_per_s": round(self.bytes_done / elapsed, 1) if elapsed else 0.0,
+                "ewma_files_per_s": round(self.ewma_files_rate or 0.0, 3),
+                "ewma_bytes_per_s": round(self.ewma_bytes_rate or 0.0, 1),
+                "eta_s": None if eta is None else round(eta, 1),
+                "stages": {
+                    stage: {**hist.snapshot(), "bytes": self.bytes[stage], "workers": self.concurrency[stage],
+                            "utilization": round(utilization[stage], 4)}
+                    for stage, hist in self.histograms.items()
+                },
+            }
+
+    def write_json(self, path):
+        """Atomically (re)write the metrics snapshot as JSON."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
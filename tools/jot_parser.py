@@ -0,0 +1,224 @@
+import io
+import time
+import xml.etree.ElementTree as ET
+
+# Jot element/attribute name -> (record field, converter name). Mirrors the record shape of `json_record`
+# in batch_send2db.py; adjust per site if a supplier uses different tag names.
+RECORD_FIELDS = {
+    "sn": ("sn", "str"),
+    "origin": ("origin", "str"),
+    "ItemNr": ("ItemNr", "str"),
+    "WorkPlan": ("WorkPlan", "str"),
+    "WorkPlanIndex": ("WorkPlanIndex", "int"),
+    "bom_name": ("bom_name", "str"),
+    "bom_index": ("bom_index", "int"),
+    "serie": ("serie", "str"),
+    "timestamp": ("timestamp", "str"),
+    "verification": ("verification", "bool"),
+    "comment": ("comment", "str"),
+    "status": ("status", "str"),
+}
+# Every <test> element becomes one entry of the record's "testinfo" list.
+TEST_TAG = "test"
+TEST_FIELDS = {
+    "id": ("id", "str"),
+    "description": ("description", "str"),
+    "limits": ("limits", "limits"),
+    "low": ("low", "number"),
+    "high": ("high", "number"),
+    "value": ("value", "auto"),
+    "unit": ("unit", "str"),
+    "ok": ("ok", "bool"),
+}
+READ_SIZE = 64 * 1024
+
+_TRUE = {"true", "1", "yes", "ok", "pass", "passed"}
+_FALSE = {"false", "0", "no", "nok", "fail", "failed"}
+
+
+def _to_str(text):
+    return text.strip() if text else ""
+
+
+def _to_int(text):
+    text = _to_str(text)
+    return int(text) if text else None
+
+
+def _to_number(text):
+    text = _to_str(text)
+    if not text:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _to_bool(text):
+    text = _to_str(text).lower()
+    if not text:  # an empty <ok/> means unknown, not failed
+        return None
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"not a boolean: {text!r}")
+
+
+def _to_auto(text):
+    """Values are numbers, booleans or free text; keep the most specific type that fits."""
+    text = _to_str(text)
+    try:
+        return _to_number(text)
+    except ValueError:
+        pass
+    lowered = text.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    return text
+
+
+def _to_limits(text):
+    """'1.0;2.0', '1.0,2.0' or '1.0 2.0' -> [1.0, 2.0]."""
+    text = _to_str(text).replace(";", " ").replace(",", " ")
+    return [_to_number(part) for part in text.split()]
+
+
+CONVERTERS = {
+    "str": _to_str,
+    "int": _to_int,
+    "number": _to_number,
+    "bool": _to_bool,
+    "auto": _to_auto,
+    "limits": _to_limits,
+}
+
+
+def _compile(fields):
+    return {tag: (field, CONVERTERS[converter]) for tag, (field, converter) in fields.items()}
+
+
+class SourceReader:
+    """File wrapper that times every read and optionally feeds the chunks into a hash object.
+
+    This lets the caller split I/O time from parse time and hash the content without a second pass.
+    """
+
+    def __init__(self, fp, hasher=None):
+        self.fp = fp
+        self.hasher = hasher
+        self.read_seconds = 0.0
+
+    def read(self, size=-1):
+        started = time.perf_counter()
+        data = self.fp.read(size)
+        self.read_seconds += time.perf_counter() - started
+        if self.hasher is not None:
+            self.hasher.update(data)
+        return data
+
+
+class JotParser:
+    """Streaming jot XML -> record parser.
+
+    The tag mapping is compiled once into dict lookups and reused for every file. Parsing runs on
+    `iterparse` and detaches elements as soon as they are consumed, so memory per file stays constant
+    however many <test> entries a jot carries. Record fields may be given as elements or as attributes of the
+    root element; test fields as child elements or as attributes of <test>. Namespaces are ignored.
+    """
+
+    def __init__(self, record_fields=None, test_tag=TEST_TAG, test_fields=None):
+        self.record_fields = _compile(record_fields or RECORD_FIELDS)
+        self.test_fields = _compile(test_fields or TEST_FIELDS)
+        self.test_tag = test_tag
+        self._local_names = {}  # qualified tag -> local name cache
+
+    def _local(self, tag):
+        name = self._local_names.get(tag)
+        if name is None:
+            name = tag.rsplit("}", 1)[-1]
+            self._local_names[tag] = name
+        return name
+
+    def _apply(self, target, mapping, name, text):
+        entry = mapping.get(name)
+        if entry is not None:
+            field, convert = entry
+            try:
+                target[field] = convert(text)
+            except ValueError:  # e.g. "N/A" for a boolean or number; the field is unknown, not the jot invalid
+                target[field] = None
+
+    def parse(self, source):
+        """Parse a jot from a path or binary file object into a record dict."""
+        record = dict.fromkeys(field for field, _ in self.record_fields.values())
+        testinfo = []
+        test = None
+        test_depth = 0
+        stack = []
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if not stack:
+                    for key, value in elem.attrib.items():
+                        self._apply(record, self.record_fields, self._local(key), value)
+                elif test is None and self._local(elem.tag) == self.test_tag:
+                    test = {}
+                    test_depth = len(stack)
+                    for key, value in elem.attrib.items():
+                        self._apply(test, self.test_fields, self._local(key), value)
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            if test is not None and len(stack) == test_depth:
+                if "limits" not in test and ("low" in test or "high" in test):
+                    test["limits"] = [test.pop("low", None), test.pop("high", None)]
+                testinfo.append(test)
+                test = None
+            elif test is not None:
+                self._apply(test, self.test_fields, self._local(elem.tag), elem.text)
+            elif stack:
+                self._apply(record, self.record_fields, self._local(elem.tag), elem.text)
+            if stack:
+                # Detach the consumed element; earlier siblings are already gone, so this is O(1).
+                stack[-1].remove(elem)
+        record["testinfo"] = testinfo
+        return record
+
+    def parse_file(self, path, hasher=None):
+        """Parse a jot file; returns (record, read seconds, total seconds).
+
+        With `hasher`, the content hash is computed on the same read.
+        """
+        started = time.perf_counter()
+        with open(path, "rb", buffering=READ_SIZE) as fp:
+            reader = SourceReader(fp, hasher)
+            record = self.parse(reader)
+        return record, reader.read_seconds, time.perf_counter() - started
+
+    def parse_bytes(self, data, hasher=None):
+        """Parse a jot already in memory (e.g. an archive member); returns (record, read seconds, total seconds)."""
+        started = time.perf_counter()
+        reader = SourceReader(io.BytesIO(data), hasher)
+        record = self.parse(reader)
+        return record, reader.read_seconds, time.perf_counter() - started
+
+
+_default_parser = None
+
+
+def default_parser():
+    """Per-process parser compiled from the default mapping on first use."""
+    global _default_parser
+    if _default_parser is None:
+        _default_parser = JotParser()
+    return _default_parser
+
+
+def parse_jot_file(path, hasher=None):
+    return default_parser().parse_file(path, hasher)
+
+
+def parse_jot_bytes(data, hasher=None):
+    return default_parser().parse_bytes(data, hasher)
@@ -0,0 +1,540 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from pathlib import Path
+
+from jot_archive import MEMBER_SEPARATOR, count_archive_jots, is_archive, iter_archive_jobs
+from jot_autotune import ConcurrencyTuner
+from jot_columnar import columnar_available
+from jot_dedup import DEDUP_INDEX_FILE, JotDeduplicator
+from jot_manifest import MANIFEST_FILE, JotManifest
+from jot_metrics import PipelineMetrics
+from jot_parser import parse_jot_bytes, parse_jot_file
+from jot_writers import OriginWriterPool, RecordSpool, make_output_factory
+
+try:
+    import dblib  # legacy parser, kept selectable for comparison
+except ImportError:
+    dblib = None
+
+ENGINES = ("thread", "process")
+PARSERS = ("builtin", "dblib") if dblib is not None else ("builtin",)
+PROCESS_CHUNK_SIZE = 64  # files handed to a worker process per task
+IN_FLIGHT_PER_WORKER = 4  # bound on queued tasks per worker; keeps memory flat regardless of folder size
+ABORT_POLL_INTERVAL = 0.5  # seconds between abort checks while waiting on in-flight tasks
+ORIGIN_BATCH_SIZE = 10000  # records per origin handed to the writers at once
+RECORD_MEMORY_FACTOR = 5  # a parsed record takes roughly this many times its XML size in memory
+BUDGET_LOW_WATER = 0.75  # once over budget, release buffers until usage drops below this share of it
+AUTOTUNE_CEILING = {"thread": 8, "process": 2}  # autotuning may go up to this many workers per CPU
+
+
+def default_options():
+    return {
+        "engine": "thread",
+        "workers": 0,  # 0 = engine default (2x CPUs for threads, 1x CPUs for processes)
+        "autotune": False,  # adjust the number of busy workers to the measured throughput, starting at `workers`
+        "parser": "builtin",
+        "skip_unchanged": False,
+        "manifest_file": MANIFEST_FILE,
+        "output_dir": "",  # "" = current directory, as before
+        "output_format": "jsonl",
+        "compression": "none",
+        "shard_records": 0,
+        "shard_bytes": 0,
+        "metrics_file": None,  # None = xml2json_metrics_<start>.json
+        "dedup": "off",  # off, sn_timestamp (drop exact re-jots) or sn_latest (newest per sn, written at the end)
+        "dedup_index": "memory",  # memory or disk (SQLite scratch file in the output directory)
+        "memory_budget_mb": 0,  # estimated memory for buffered records across all origins; 0 = no budget
+        "max_latency": 0,  # seconds a collected record may wait before everything is flushed; 0 = batch size only
+    }
+
+
+def default_workers(engine):
+    return os.cpu_count() if engine == "process" else os.cpu_count() * 2
+
+
+def iter_xml_files(folder, manifest=None, metrics=None):
+    """Stream (path, size, mtime_ns) jobs for the XML files of a folder via os.scandir.
+
+    The listing is never materialized; with a manifest, files whose size and mtime are unchanged are skipped.
+    With metrics, the time spent producing each job is recorded as the discovery stage.
+    """
+    with os.scandir(folder) as entries:
+        started = time.perf_counter()
+        for entry in entries:
+            if entry.name.lower().endswith(".xml") and entry.is_file():
+                stat = entry.stat()
+                if manifest is not None and manifest.is_unchanged(entry.path, stat.st_size, stat.st_mtime_ns):
+                    continue
+                if metrics is not None:
+                    metrics.record("discovery", time.perf_counter() - started, stat.st_size)
+                yield entry.path, stat.st_size, stat.st_mtime_ns
+                started = time.perf_counter()
+
+
+def iter_chunks(iterable, size):
+    """Yield lists of up to `size` items from an iterable."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def new_hasher():
+    """Content hash used by the manifest to tell a touched file from a changed one."""
+    return hashlib.blake2b(digest_size=16)
+
+
+def file_digest(path):
+    hasher = new_hasher()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def parse_jot(job, with_hash=False, parser="builtin"):
+    """Parse one jot job; returns a compact (job, record, error, content hash, (read s, parse s)) tuple.
+
+    Archive jobs carry the member data (and any error reading it) after the stat fields; the returned job is
+    always the plain (path, size, mtime_ns) so the data does not travel further.
+    """
+    path = job[0]
+    read_seconds = 0.0
+    started = time.perf_counter()
+    data = None
+    if len(job) > 3:
+        job, data, read_error = job[:3], job[3], job[4]
+        if read_error is not None:
+            return job, None, read_error, None, (0.0, 0.0)
+    try:
+        if data is not None:  # archive member; dblib only parses files, so always the built-in parser
+            hasher = new_hasher() if with_hash else None
+            record, read_seconds, total = parse_jot_bytes(data, hasher)
+            digest = hasher.hexdigest() if hasher is not None else None
+            return job, record, None, digest, (read_seconds, total - read_seconds)
+        if parser == "dblib":
+            digest = file_digest(path) if with_hash else None
+            read_seconds = time.perf_counter() - started  # dblib reads on its own; only hashing counts as read
+            record = dblib.parse_xml_to_json(Path(path))
+            return job, record, None, digest, (read_seconds, time.perf_counter() - started - read_seconds)
+        # The built-in parser hashes on the same read it parses from.
+        hasher = new_hasher() if with_hash else None
+        record, read_seconds, total = parse_jot_file(path, hasher)
+        digest = hasher.hexdigest() if hasher is not None else None
+        return job, record, None, digest, (read_seconds, total - read_seconds)
+    except Exception as e:
+        return job, None, str(e), None, (read_seconds, time.perf_counter() - started - read_seconds)
+
+
+def parse_files_chunk(jobs, with_hash=False, parser="builtin"):
+    """Parse a chunk of jot jobs in a worker process so only compact results travel back to the parent."""
+    return [parse_jot(job, with_hash, parser) for job in jobs]
+
+
+def _default_log(message, error=False):
+    (logging.error if error else logging.info)(message)
+
+
+class JotConverter:
+    """Headless jot folder -> per-origin output conversion, shared by the xml2json2 GUI and headless tools.
+
+    Progress is exposed through `total_files`, `processed_files` and `metrics`; messages go to `log(message,
+    error=False)`, which may be called from worker and writer threads. Setting `abort_event` stops the run.
+    """
+
+    def __init__(self, log=None, abort_event=None):
+        self.log = log or _default_log
+        self.abort_event = abort_event or threading.Event()
+        self.options = default_options()
+        self.start_time = None
+        self.total_files = 0
+        self.processed_files = 0
+        self.manifest = None
+        self.manifest_pending = defaultdict(list)  # origin -> manifest entries awaiting their records' write
+        self.manifest_duplicates = []  # manifest entries of jots dropped as duplicates
+        self.origin_output_files = {}  # Keep track of output files for each origin
+        self.writers = None  # OriginWriterPool for the running process
+        self.executor = None  # worker pool for the running process
+        self.tuner = None  # ConcurrencyTuner when autotuning
+        self.grouped = defaultdict(list)  # origin -> records not yet handed to the writers
+        self.buffered_bytes = defaultdict(int)  # origin -> estimated memory of its `grouped` records
+        self.buffered_total = 0
+        self.spools = {}  # origin -> RecordSpool holding records moved out of memory under the budget
+        self.oldest_unwritten = None  # perf_counter time the oldest record in `grouped` was collected
+        self.metrics = None  # PipelineMetrics for the running process
+        self.metrics_file = None
+        self.dedup = None  # JotDeduplicator for the running process, if enabled
+        self.duplicates_dropped = 0
+        self.write_errors = 0  # failed writes/flushes/closes reported by the writer pool
+        self.completed = False
+
+    def process_folder(self, folder, options=None):
+        """Convert every (new or changed) jot in `folder`, or in a .zip/.tar[.gz] archive, without extracting it.
+
+        Returns True when the run completed.
+        """
+        self.completed = False
+        try:
+            self.log("Reading the folder... Please wait.")
+            if not self.open_run(options):
+                return False
+            options = self.options
+            archive = is_archive(folder)
+            if archive and options["parser"] != "builtin":
+                self.log("Archive members are parsed with the built-in parser.")
+            # Counting pass only; the files themselves are streamed again during processing.
+            scan_started = time.perf_counter()
+            if archive:
+                total_files, total_bytes = count_archive_jots(folder, self.manifest, self.abort_event)
+            else:
+                total_files = total_bytes = 0
+                for _, size, _ in iter_xml_files(folder, self.manifest):
+                    if self.abort_event.is_set():
+                        break
+                    total_files += 1
+                    total_bytes += size
+            if self.abort_event.is_set():
+                self.log("Aborted while reading the folder.")
+                return False
+            self.total_files = total_files
+            self.metrics.set_totals(total_files, total_bytes)
+            logging.info(f"Pre-scan found {total_files} files ({total_bytes} bytes) "
+                         f"in {time.perf_counter() - scan_started:.2f} s")
+            if self.total_files == 0:
+                self.log("No new or changed XML files found." if self.manifest else "No XML files found.",
+                         error=True)
+                return False
+
+            self.log(f"Processing {self.total_files} files in {folder}.")
+            self.convert((iter_archive_jobs if archive else iter_xml_files)(folder, self.manifest, self.metrics))
+            self.collect_held()
+
+            # Dump remaining records for all origins
+            self.dump_grouped()
+            self.close_writers()
+
+            self.log(f"Processing completed. Total time elapsed: {datetime.now() - self.start_time}")
+            self.log_summary()
+            if self.write_errors:
+                self.log(f"{self.write_errors} write errors; the affected records are not in the output.", error=True)
+            self.completed = not self.abort_event.is_set() and not self.write_errors
+            return self.completed
+
+        except Exception as e:
+            self.log(f"Error processing folder {folder}: {e}", error=True)
+            return False
+        finally:
+            self.close_run()
+
+    def open_run(self, options=None):
+        """Validate the options and set up manifest, dedup index, metrics and writers for a run.
+
+        Returns False (after logging why) if the run cannot start. Always pair with `close_run()`.
+        """
+        self.start_time = datetime.now()
+        self.total_files = 0
+        self.processed_files = 0
+        self.duplicates_dropped = 0
+        self.write_errors = 0
+        self.options = options = {**default_options(), **(options or {})}
+        if options["output_format"] == "parquet" and not columnar_available():
+            self.log("Parquet output needs the 'pyarrow' package, which is not installed.", error=True)
+            return False
+        if options["output_format"] == "parquet" and (options["shard_records"] or options["shard_bytes"]):
+            self.log("Shard limits apply to JSONL output only; writing one Parquet file pair per origin.")
+        if options["output_dir"]:
+            os.makedirs(options["output_dir"], exist_ok=True)
+        self.manifest = JotManifest(options["manifest_file"]) if options["skip_unchanged"] else None
+        self.manifest_pending.clear()
+        self.manifest_duplicates.clear()
+        if options["dedup"] != "off":
+            self.dedup = JotDeduplicator(options["dedup"], options["dedup_index"],
+                                         str(self.output_path(DEDUP_INDEX_FILE)))
+        self.metrics = PipelineMetrics()
+        self.tuner = None
+        if options["autotune"]:
+            engine = options["engine"]
+            self.tuner = ConcurrencyTuner(options["workers"] or default_workers(engine),
+                                          os.cpu_count() * AUTOTUNE_CEILING[engine], log=self.log)
+        self.metrics_file = (options["metrics_file"] or
+                             f"xml2json_metrics_{self.start_time.strftime('%Y_%m_%d_%H_%M_%S')}.json")
+        # Group records by origin; each group is a list of JSON records.
+        self.grouped = defaultdict(list)
+        self.buffered_bytes.clear()
+        self.buffered_total = 0
+        self.spools = {}
+        self.oldest_unwritten = None
+
+        # Output files get a new timestamp at the start of each run
+        self.origin_output_files = {}
+        output_factory = make_output_factory(options["compression"], options["shard_records"],
+                                             options["shard_bytes"], output_format=options["output_format"])
+        self.writers = OriginWriterPool(on_written=self.on_batch_written, on_error=self.on_write_error,
+                                        output_factory=output_factory, metrics=self.metrics)
+        self.log(f"Writing with the {self.writers.encoder_name} encoder.")
+        return True
+
+    def close_run(self):
+        """Close writers, executor, spools, dedup index and manifest and write the final metrics."""
+        self.close_writers()
+        for spool in self.spools.values():
+            spool.close()
+        self.spools = {}
+        self.shutdown_executor()
+        self.write_metrics()
+        if self.dedup is not None:
+            self.duplicates_dropped = self.dedup.dropped
+            self.dedup.close()
+            self.dedup = None
+        if self.manifest is not None:
+            self.record_duplicates()
+            self.manifest.close()
+            self.manifest = None
+
+    def convert(self, jobs):
+        """Parse jobs on the configured engine into the per-origin batches."""
+        if self.options["engine"] == "process":
+            self.run_process_engine(jobs)
+        else:
+            self.run_thread_engine(jobs)
+
+    def dump_grouped(self):
+        """Hand every non-empty origin batch (including spooled records) to the writers."""
+        for origin in {origin for origin, records in self.grouped.items() if records} | set(self.spools):
+            self.append_to_output_file(origin, self.take_batch(origin))
+        self.oldest_unwritten = None
+
+    def take_batch(self, origin):
+        """Remove and return an origin's buffered records, spooled ones first so the order is kept."""
+        records = self.grouped.pop(origin, [])
+        self.buffered_total -= self.buffered_bytes.pop(origin, 0)
+        spool = self.spools.pop(origin, None)
+        if spool is not None:
+            records = spool.read_all() + records
+            spool.close()
+        return records
+
+    def enforce_memory_budget(self, budget):
+        """Release the largest origin buffers until the estimate is back under the low-water mark.
+
+        JSONL buffers go straight to the writers; for Parquet they are spooled to a temporary file instead,
+        so the origin still gets full-size row groups.
+        """
+        spill = self.options["output_format"] == "parquet"
+        while self.buffered_total > budget * BUDGET_LOW_WATER and self.buffered_bytes:
+            origin = max(self.buffered_bytes, key=self.buffered_bytes.get)
+            if spill:
+                if origin not in self.spools:
+                    self.spools[origin] = RecordSpool(self.options["output_dir"] or None)
+                self.spools[origin].write(self.grouped.pop(origin))
+                self.buffered_total -= self.buffered_bytes.pop(origin)
+            else:
+                self.append_to_output_file(origin, self.take_batch(origin))
+
+    def flush(self):
+        """Write out everything collected so far and block until it (and its manifest entries) is on disk."""
+        self.dump_grouped()
+        self.writers.flush()
+        self.record_duplicates()
+
+    def log_summary(self):
+        snapshot = self.metrics.snapshot()
+        stage, utilization = self.metrics.bottleneck()
+        if self.tuner is not None:
+            best_rate, best_workers = self.tuner.best
+            self.log(f"Autotune: {self.tuner.adjustments} adjustments, ended at {self.tuner.concurrency} workers; "
+                     f"best window {best_rate / 1e6:.2f} MB/s at {best_workers} workers.")
+        if self.dedup is not None:
+            self.log(f"Dropped {self.dedup.dropped} duplicate records ({self.options['dedup']}), "
+                     f"kept {self.dedup.kept}.")
+        self.log(f"{snapshot['files_per_s']:.1f} files/s, {snapshot['bytes_per_s'] / 1e6:.2f} MB/s; "
+                 f"busiest stage: {stage} ({utilization:.0%}). Metrics: {self.metrics_file}")
+
+    def write_metrics(self):
+        if self.metrics is not None and self.metrics_file is not None:
+            try:
+                self.metrics.write_json(self.metrics_file)
+            except OSError as e:
+                logging.error(f"Error writing metrics to {self.metrics_file}: {e}")
+
+    def output_path(self, name):
+        return Path(self.options["output_dir"] or ".") / name
+
+    def run_thread_engine(self, jobs):
+        """Parse files on a thread pool (suits I/O-bound network shares)."""
+        max_workers = self.set_workers("thread")
+        worker = partial(parse_jot, with_hash=self.manifest is not None, parser=self.options["parser"])
+        executor = self.get_executor(ThreadPoolExecutor, self.tuner.maximum if self.tuner else max_workers)
+        for result in self.run_bounded(executor, worker, jobs, max_workers * IN_FLIGHT_PER_WORKER):
+            self.collect_result(*result)
+
+    def run_process_engine(self, jobs):
+        """Parse files on a process pool, sending them to the workers in chunks to sidestep the GIL."""
+        max_workers = self.set_workers("process")
+        worker = partial(parse_files_chunk, with_hash=self.manifest is not None,
+                         parser=self.options["parser"])
+        executor = self.get_executor(ProcessPoolExecutor, self.tuner.maximum if self.tuner else max_workers)
+        for results in self.run_bounded(executor, worker, iter_chunks(jobs, PROCESS_CHUNK_SIZE),
+                                        max_workers * IN_FLIGHT_PER_WORKER):
+            for result in results:
+                self.collect_result(*result)
+
+    def set_workers(self, engine, workers=None):
+        """Number of busy workers for the engine (the tuner's current choice when autotuning), as metrics see it."""
+        workers = workers or (self.tuner.concurrency if self.tuner else
+                              self.options["workers"] or default_workers(engine))
+        self.metrics.set_concurrency("read", workers)
+        self.metrics.set_concurrency("parse", workers)
+        return workers
+
+    def get_executor(self, executor_class, max_workers):
+        """The run's worker pool, created on first use and kept until `close_run()` so repeated `convert()`
+        calls (watch mode) do not pay for new threads or processes each time."""
+        if self.executor is None:
+            self.executor = executor_class(max_workers=max_workers)
+        return self.executor
+
+    def shutdown_executor(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def run_bounded(self, executor, fn, tasks, max_in_flight):
+        """Submit tasks lazily, keeping at most `max_in_flight` futures pending, and yield results as they complete.
+
+        When autotuning, the tuner's concurrency replaces `max_in_flight`, so it decides how many workers are
+        busy. On abort the pending futures are cancelled straight away instead of being drained.
+        """
+        tasks = iter(tasks)
+        in_flight = set()
+        exhausted = False
+        if self.tuner is not None:
+            self.tuner.resume(self.metrics.bytes_done, self.metrics.files_done)
+        try:
+            while not self.abort_event.is_set():
+                if self.tuner is not None:
+                    if self.tuner.observe(self.metrics.bytes_done, self.metrics.files_done):
+                        self.set_workers(self.options["engine"], self.tuner.concurrency)
+                    max_in_flight = self.tuner.concurrency
+                while not exhausted and len(in_flight) < max_in_flight:
+                    task = next(tasks, None)
+                    if task is None:
+                        exhausted = True
+                    else:
+                        in_flight.add(executor.submit(fn, task))
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, timeout=ABORT_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if self.abort_event.is_set():
+                        break
+                    yield future.result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def collect_result(self, job, record, error, digest, timings):
+        """Group a parsed record by origin and dump the origin's batch once it reaches 10,000 records."""
+        self.processed_files += 1
+        read_seconds, parse_seconds = timings
+        self.metrics.record("read", read_seconds, job[1])
+        self.metrics.record("parse", parse_seconds, job[1])
+        self.metrics.file_done(job[1], error is not None)
+        if error is not None:
+            self.log(f"Error parsing {os.path.basename(job[0].replace(MEMBER_SEPARATOR, os.sep))}: {error}",
+                     error=True)
+        if record is None:
+            return
+        # The parser pre-fills missing fields with None; the record states the origin it is filed under, so
+        # validators and loaders that require one accept it.
+        origin = record["origin"] = record.get("origin") or "unknown"
+        if self.manifest is not None:
+            if self.manifest.has_content(job[0], digest):
+                # Touched but not changed: the record is already in an earlier output.
+                self.manifest.touch(job[0], job[1], job[2])
+                return
+        if self.dedup is not None:
+            write, dropped = self.dedup.check(record, (*job, digest))
+            if dropped is not None and self.manifest is not None:
+                # Nothing to write, so the manifest entry does not have to wait for a batch.
+                self.manifest_duplicates.append(dropped)
+                if len(self.manifest_duplicates) >= ORIGIN_BATCH_SIZE:
+                    self.record_duplicates()
+            if not write:
+                return
+        self.group_record(origin, record, (*job, digest))
+
+    def group_record(self, origin, record, entry):
+        """Add a record to its origin's batch and hand batches to the writers as they fill up."""
+        if self.manifest is not None:
+            self.manifest_pending[origin].append(entry)
+        self.grouped[origin].append(record)
+        estimate = entry[1] * RECORD_MEMORY_FACTOR
+        self.buffered_bytes[origin] += estimate
+        self.buffered_total += estimate
+        spool = self.spools.get(origin)
+        if len(self.grouped[origin]) + (spool.count if spool else 0) >= ORIGIN_BATCH_SIZE:
+            # The writer thread takes ownership of the batch list.
+            self.append_to_output_file(origin, self.take_batch(origin))
+        budget = self.options["memory_budget_mb"] * 1024 * 1024
+        if budget and self.buffered_total > budget:
+            self.enforce_memory_budget(budget)
+        max_latency = self.options["max_latency"]
+        if max_latency:
+            now = time.perf_counter()
+            if self.oldest_unwritten is None:
+                self.oldest_unwritten = now
+            elif now - self.oldest_unwritten >= max_latency:
+                self.flush()
+
+    def collect_held(self):
+        """Group the records the deduplicator held back until every jot was seen (sn_latest)."""
+        if self.dedup is None:
+            return
+        for record, entry in self.dedup.held():
+            self.group_record(record.get("origin") or "unknown", record, entry)
+
+    def append_to_output_file(self, origin, records):
+        """Queue the processed records for appending to the output file for the origin."""
+        if origin not in self.origin_output_files:
+            # If no file for this origin yet, create it with the timestamped name.
+            timestamp = datetime.now().strftime('%Y_%m_%d_%H_%M_%S')
+            output_file = self.output_path(f"{origin}_processed_data_{timestamp}.jsonl")
+            self.origin_output_files[origin] = output_file
+        else:
+            # Use the existing output file for this origin
+            output_file = self.origin_output_files[origin]
+
+        # Manifest entries travel with their batch and are committed only once it is on disk.
+        self.writers.submit(origin, output_file, records, context=self.manifest_pending.pop(origin, None))
+
+    def on_batch_written(self, origin, segments, manifest_entries):
+        """Writer-thread callback once a batch has been flushed; segments are (file, count) pieces in order."""
+        start = 0
+        for output_file, count in segments:
+            self.log(f"Wrote {count} records to {output_file}")
+            if self.manifest is not None and manifest_entries:
+                self.manifest.record_many(manifest_entries[start:start + count], origin, output_file)
+            start += count
+
+    def record_duplicates(self):
+        if self.manifest_duplicates:
+            self.manifest.record_many(self.manifest_duplicates, None, None)
+            self.manifest_duplicates = []
+
+    def on_write_error(self, origin, output_file, error):
+        self.write_errors += 1
+        self.log(f"Error writing to {output_file}: {error}", error=True)
+
+    def close_writers(self):
+        """Flush and close all open output files."""
+        writers, self.writers = self.writers, None  # a failed close is not retried from close_run
+        if writers is not None:
+            writers.close()
@@ -0,0 +1,157 @@
+import argparse
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+
+from jot_dedup import DEDUP_INDEXES, DEDUP_MODES
+from jot_manifest import MANIFEST_FILE
+from jot_pipeline import ENGINES, PARSERS, JotConverter, iter_xml_files
+from jot_writers import COMPRESSIONS
+
+POLL_INTERVAL = 2.0  # seconds between folder scans
+SETTLE_SECONDS = 1.0  # a file must be at least this old (by mtime) before it is picked up
+MAX_LATENCY = 5.0  # seconds a record may wait in memory during a long cycle before everything is flushed
+METRICS_EVERY = 30  # write the metrics file every N cycles
+
+
+class JotWatcher:
+    """Headless watch mode: polls a jot folder and converts newly arrived, fully written files as they appear.
+
+    A file counts as fully written once it shows the same size and mtime on two consecutive scans and its
+    mtime is at least `settle_seconds` old. Every cycle's records are flushed before the next scan, so a jot
+    reaches the per-origin output within about two poll intervals plus its parse time; `max_latency` bounds
+    the wait inside long cycles (e.g. the backlog on start-up). The manifest is always used, so restarting
+    the watcher only picks up files it has not converted yet.
+    """
+
+    def __init__(self, folder, options=None, poll_interval=POLL_INTERVAL, settle_seconds=SETTLE_SECONDS,
+                 log=None, abort_event=None):
+        self.folder = folder
+        self.options = {**(options or {}), "skip_unchanged": True}
+        self.options.setdefault("max_latency", MAX_LATENCY)
+        self.poll_interval = poll_interval
+        self.settle_ns = int(settle_seconds * 1e9)
+        self.abort_event = abort_event or threading.Event()
+        self.converter = JotConverter(log=log, abort_event=self.abort_event)
+        self.log = self.converter.log
+        self.candidates = {}  # path -> (size, mtime_ns) seen on the previous scan, not yet converted
+        self.done = {}  # path -> (size, mtime_ns) already converted, so repeated scans skip the manifest lookup
+
+    def scan(self):
+        """Return the jobs that are ready to convert, remembering everything else for the next scan."""
+        now_ns = time.time_ns()
+        ready = []
+        candidates = {}
+        done = {}
+        for job in iter_xml_files(self.folder):
+            path, stat = job[0], job[1:]
+            known = self.done.get(path)
+            if known == stat or (known is None and self.converter.manifest.is_unchanged(path, *stat)):
+                done[path] = stat
+            elif self.candidates.get(path) == stat and now_ns - stat[1] >= self.settle_ns:
+                ready.append(job)
+            else:
+                candidates[path] = stat
+        # Deleted files drop out of both maps here.
+        self.candidates, self.done = candidates, done
+        return ready
+
+    def run(self):
+        """Watch until `abort_event` is set; returns False if the pipeline could not be set up."""
+        options = self.options
+        if options.get("output_format", "jsonl") != "jsonl":
+            self.log("Watch mode writes JSONL only; Parquet files are not readable until they are closed.",
+                     error=True)
+            return False
+        if options.get("dedup") == "sn_latest":
+            self.log("sn_latest holds every record until all jots were seen, which never happens in watch mode; "
+                     "use sn_timestamp.", error=True)
+            return False
+        if options.get("compression") == "lzma":
+            self.log("xz shards only become readable once they rotate; use gzip for low latency.")
+        if not self.converter.open_run(options):
+            self.converter.close_run()
+            return False
+        self.log(f"Watching {self.folder} every {self.poll_interval:g} s.")
+        cycles = 0
+        try:
+            while not self.abort_event.is_set():
+                started = time.perf_counter()
+                ready = self.scan()
+                if ready:
+                    self.converter.total_files += len(ready)
+                    self.converter.metrics.set_totals(self.converter.total_files,
+                                                      self.converter.metrics.total_bytes +
+                                                      sum(job[1] for job in ready))
+                    self.converter.convert(ready)
+                    self.converter.flush()
+                    # Files that failed to parse count as done too; they are retried once they change.
+                    self.done.update((job[0], job[1:]) for job in ready)
+                    self.log(f"Converted {len(ready)} new jots in {time.perf_counter() - started:.2f} s "
+                             f"({self.converter.processed_files} this session).")
+                cycles += 1
+                if cycles % METRICS_EVERY == 0:
+                    self.converter.metrics.tick()
+                    self.converter.write_metrics()
+                self.abort_event.wait(max(0.0, self.poll_interval - (time.perf_counter() - started)))
+        except Exception as e:
+            self.log(f"Error watching folder {self.folder}: {e}", error=True)
+            return False
+        finally:
+            self.converter.dump_grouped()
+            self.converter.log_summary()
+            self.converter.close_run()
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuously convert new jots in a folder to per-origin JSONL.")
+    parser.add_argument("folder")
+    parser.add_argument("--output-dir", default="")
+    parser.add_argument("--engine", choices=ENGINES, default="thread")
+    parser.add_argument("--workers", type=int, default=0, help="0 = engine default")
+    parser.add_argument("--autotune", action="store_true", help="adjust the worker count to the measured rate")
+    parser.add_argument("--parser", choices=PARSERS, default="builtin")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none")
+    parser.add_argument("--shard-records", type=int, default=0, help="rotate outputs after N records")
+    parser.add_argument("--shard-mb", type=int, default=0, help="rotate outputs after N MB")
+    parser.add_argument("--dedup", choices=DEDUP_MODES, default="off")
+    parser.add_argument("--dedup-index", choices=DEDUP_INDEXES, default="memory")
+    parser.add_argument("--memory-budget", type=int, default=0, help="MB for buffered records; 0 = no budget")
+    parser.add_argument("--manifest", default=MANIFEST_FILE)
+    parser.add_argument("--metrics-file", default=None)
+    parser.add_argument("--poll", type=float, default=POLL_INTERVAL, help="seconds between scans")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS, help="minimum file age in seconds")
+    parser.add_argument("--max-latency", type=float, default=MAX_LATENCY,
+                        help="flush collected records after this many seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    options = {
+        "engine": args.engine,
+        "workers": args.workers,
+        "autotune": args.autotune,
+        "parser": args.parser,
+        "output_dir": args.output_dir,
+        "compression": args.compression,
+        "shard_records": args.shard_records,
+        "shard_bytes": args.shard_mb * 1024 * 1024,
+        "dedup": args.dedup,
+        "dedup_index": args.dedup_index,
+        "manifest_file": args.manifest,
+        "metrics_file": args.metrics_file,
+        "max_latency": args.max_latency,
+        "memory_budget_mb": args.memory_budget,
+    }
+    watcher = JotWatcher(args.folder, options, args.poll, args.settle)
+    signal.signal(signal.SIGINT, lambda *_: watcher.abort_event.set())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda *_: watcher.abort_event.set())
+    raise SystemExit(0 if watcher.run() else 1)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
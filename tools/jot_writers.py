@@ -0,0 +1,360 @@
+import gzip
+import hashlib
+import json
+import logging
+import lzma
+import queue
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from jot_columnar import ParquetOutput
+from record_codec import make_encoder, orjson
+
+WRITE_BUFFER_SIZE = 1 << 20  # bytes of OS-level buffering per open output file
+WRITE_QUEUE_SIZE = 8  # batches waiting for the writer thread before submit() blocks
+WRITER_POLL_INTERVAL = 0.5  # seconds between checks that the writer thread is still alive while waiting on it
+OUTPUT_FORMATS = ("jsonl", "parquet")
+COMPRESSIONS = ("none", "gzip", "lzma")
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "lzma": ".xz"}
+GZIP_LEVEL = 6
+LZMA_PRESET = 6
+
+_STOP = object()
+
+
+class RecordSpool:
+    """Unnamed temporary JSONL file that holds an origin's records outside the heap until they are written.
+
+    Used under a memory budget when the output format wants full batches (Parquet row groups), so a buffer
+    can leave memory without being written out as a tiny batch.
+    """
+
+    def __init__(self, directory=None, fast_json=True):
+        self.encode = make_encoder(fast_json)[1]
+        self.decode = orjson.loads if fast_json and orjson is not None else json.loads
+        self.fp = tempfile.TemporaryFile(dir=directory)
+        self.count = 0
+
+    def write(self, records):
+        self.fp.write(b"".join(self.encode(record) for record in records))
+        self.count += len(records)
+
+    def read_all(self):
+        """Return the spooled records in order and empty the spool."""
+        self.fp.seek(0)
+        records = [self.decode(line) for line in self.fp]
+        self.fp.seek(0)
+        self.fp.truncate()
+        self.count = 0
+        return records
+
+    def close(self):
+        self.fp.close()
+
+
+class JsonlOutput:
+    """A single appendable JSONL file, the layout xml2json2 has always produced."""
+
+    durable_on_flush = True
+
+    def __init__(self, path, encode, buffer_size=WRITE_BUFFER_SIZE):
+        self.path = Path(path)
+        self.encode = encode
+        self.fp = open(self.path, "ab", buffering=buffer_size)
+        self.serialize_seconds = 0.0  # read by the writer pool to split serialize from write time
+
+    def write_all(self, records):
+        """Write the records; returns [(path, count)] segments describing where they went."""
+        encode = self.encode
+        started = time.perf_counter()
+        data = b"".join(encode(record) for record in records)
+        self.serialize_seconds += time.perf_counter() - started
+        self.fp.write(data)
+        return [(self.path, len(records))]
+
+    def flush(self):
+        self.fp.flush()
+
+    def close(self):
+        self.fp.close()
+
+
+class _DigestWriter:
+    """Pass-through writer that hashes and counts the (possibly compressed) bytes reaching the file."""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.bytes += memoryview(data).nbytes
+        return self.fp.write(data)
+
+    def flush(self):
+        self.fp.flush()
+
+
+class ShardedJsonlOutput:
+    """Per-origin JSONL output split into size-rotated, optionally compressed shards.
+
+    Shards are named `<stem>.part0001.jsonl[.gz|.xz]` and rotate once `max_records` records or `max_bytes`
+    uncompressed bytes have been written (0 disables a limit). When a shard is closed a small
+    `<shard>.manifest.json` is written next to it; its presence tells downstream consumers the shard is
+    complete and safe to pick up in parallel. gzip shards are sync-flushed on every flush(), xz shards only
+    become fully readable once closed.
+    """
+
+    def __init__(self, path, encode, buffer_size=WRITE_BUFFER_SIZE, max_records=0, max_bytes=0,
+                 compression="none", origin=None):
+        self.durable_on_flush = compression != "lzma"
+        self.stem = Path(path).with_suffix("")
+        self.encode = encode
+        self.buffer_size = buffer_size
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.origin = origin
+        self.shard_index = 0
+        self.shard = None  # dict describing the open shard
+        self.serialize_seconds = 0.0
+
+    def _open_shard(self):
+        self.shard_index += 1
+        path = Path(f"{self.stem}.part{self.shard_index:04d}.jsonl{COMPRESSION_SUFFIXES[self.compression]}")
+        raw = open(path, "wb", buffering=self.buffer_size)
+        digest = _DigestWriter(raw)
+        if self.compression == "gzip":
+            stream = gzip.GzipFile(filename=path.with_suffix("").name, mode="wb", fileobj=digest,
+                                   compresslevel=GZIP_LEVEL)
+        elif self.compression == "lzma":
+            stream = lzma.LZMAFile(digest, mode="wb", preset=LZMA_PRESET)
+        else:
+            stream = digest
+        self.shard = {"path": path, "raw": raw, "digest": digest, "stream": stream, "records": 0, "bytes": 0,
+                      "first_sn": None, "last_sn": None, "opened": datetime.now().isoformat(timespec="seconds")}
+
+    def _full(self):
+        shard = self.shard
+        return shard["records"] > 0 and bool(
+            (self.max_records and shard["records"] >= self.max_records)
+            or (self.max_bytes and shard["bytes"] >= self.max_bytes))
+
+    def write_all(self, records):
+        """Write the records, rotating as needed; returns [(shard path, count)] segments."""
+        segments = []
+        for record in records:
+            if self.shard is None:
+                self._open_shard()
+            elif self._full():
+                self._close_shard()
+                self._open_shard()
+            shard = self.shard
+            started = time.perf_counter()
+            line = self.encode(record)
+            self.serialize_seconds += time.perf_counter() - started
+            shard["stream"].write(line)
+            shard["records"] += 1
+            shard["bytes"] += len(line)
+            sn = record.get("sn")
+            if shard["first_sn"] is None:
+                shard["first_sn"] = sn
+            shard["last_sn"] = sn
+            if segments and segments[-1][0] == shard["path"]:
+                segments[-1][1] += 1
+            else:
+                segments.append([shard["path"], 1])
+        return [tuple(segment) for segment in segments]
+
+    def flush(self):
+        if self.shard is None:
+            return
+        stream = self.shard["stream"]
+        if isinstance(stream, gzip.GzipFile):
+            stream.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            stream.flush()
+        self.shard["raw"].flush()
+
+    def _close_shard(self):
+        shard, self.shard = self.shard, None
+        if shard["stream"] is not shard["digest"]:
+            shard["stream"].close()  # writes the compressed stream trailer through the digest writer
+        shard["raw"].close()
+        manifest = {
+            "shard": shard["path"].name,
+            "origin": self.origin,
+            "index": self.shard_index,
+            "records": shard["records"],
+            "uncompressed_bytes": shard["bytes"],
+            "file_bytes": shard["digest"].bytes,
+            "compression": self.compression,
+            "sha256": shard["digest"].sha256.hexdigest(),
+            "first_sn": shard["first_sn"],
+            "last_sn": shard["last_sn"],
+            "opened": shard["opened"],
+            "closed": datetime.now().isoformat(timespec="seconds"),
+        }
+        with open(shard["path"].with_name(shard["path"].name + ".manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    def close(self):
+        if self.shard is not None:
+            self._close_shard()
+
+
+def make_output_factory(compression="none", shard_records=0, shard_bytes=0, buffer_size=WRITE_BUFFER_SIZE,
+                        output_format="jsonl"):
+    """Build the factory the writer pool calls to open the output for a new origin file."""
+    def factory(origin, path, encode):
+        if output_format == "parquet":
+            return ParquetOutput(path, compression, origin=origin)
+        if compression == "none" and not shard_records and not shard_bytes:
+            return JsonlOutput(path, encode, buffer_size)
+        return ShardedJsonlOutput(path, encode, buffer_size, max_records=shard_records, max_bytes=shard_bytes,
+                                  compression=compression, origin=origin)
+    return factory
+
+
+class OriginWriterPool:
+    """Keeps one open, buffered output per origin file and writes batches on a dedicated thread.
+
+    `submit` hands a batch over through a bounded queue, so serialization and disk I/O overlap with parsing
+    while a slow disk still applies back-pressure to the producer. Outputs are flushed whenever the queue runs
+    dry, or every `queue_size` batches under sustained load. `on_written(origin, segments, context)` fires
+    only after that flush (or after close, for outputs that are not `durable_on_flush`), so callers such as
+    the manifest never record a batch that is not on disk yet; `segments` lists the (file, record count)
+    pieces the batch went to. `on_error(origin, output_file, exception)` fires right away. Both run on the
+    writer thread; an exception raised by either is logged (and a failed on_written passed to on_error) rather
+    than stopping the thread. Should the thread die anyway, submit/flush/close raise instead of blocking.
+    """
+
+    def __init__(self, on_written=None, on_error=None, queue_size=WRITE_QUEUE_SIZE, fast_json=True,
+                 output_factory=None, metrics=None):
+        self.metrics = metrics  # optional PipelineMetrics receiving serialize/write timings
+        self.on_written = on_written
+        self.on_error = on_error
+        self.encoder_name, self.encode = make_encoder(fast_json)
+        self.output_factory = output_factory or make_output_factory()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.outputs = {}  # output file -> output object; only touched by the writer thread
+        self.unflushed = []  # on_written calls waiting for the next flush
+        self.failure = None  # exception that stopped the writer thread
+        self.thread = threading.Thread(target=self._run, name="origin-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, origin, output_file, records, context=None):
+        """Queue a batch for writing; the caller must not reuse the `records` list afterwards."""
+        self._put((origin, output_file, records, context))
+
+    def flush(self):
+        """Block until everything queued so far is written and flushed to the OS."""
+        done = threading.Event()
+        self._put((None, None, None, done))
+        while not done.wait(WRITER_POLL_INTERVAL):
+            self._check_alive()
+
+    def close(self):
+        """Drain the queue, close every output and stop the writer thread."""
+        self._put(_STOP)
+        self.thread.join()
+        if self.failure is not None:
+            raise RuntimeError(f"The writer thread stopped ({self.failure!r}); queued batches were not written.")
+
+    def _check_alive(self):
+        if not self.thread.is_alive():
+            raise RuntimeError(f"The writer thread stopped ({self.failure!r}); queued batches were not written.")
+
+    def _put(self, item):
+        while True:
+            self._check_alive()
+            try:
+                self.queue.put(item, timeout=WRITER_POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def _report_error(self, origin, output_file, error):
+        if self.on_error:
+            try:
+                self.on_error(origin, output_file, error)
+            except Exception as e:
+                logging.error(f"Error reporting a write error for {output_file}: {e}")
+
+    def _run(self):
+        try:
+            self._write_batches()
+        except BaseException as e:
+            self.failure = e
+            logging.error(f"Writer thread stopped: {e!r}")
+            raise
+
+    def _write_batches(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            origin, output_file, records, context = item
+            if records is None:
+                self._flush_outputs()
+                context.set()
+                continue
+            try:
+                started = time.perf_counter()
+                output = self._output_for(origin, output_file)
+                serialized_before = output.serialize_seconds
+                segments = output.write_all(records)
+                if self.metrics is not None:
+                    serialize_seconds = output.serialize_seconds - serialized_before
+                    self.metrics.record("serialize", serialize_seconds)
+                    self.metrics.record("write", time.perf_counter() - started - serialize_seconds)
+                self.unflushed.append((output, (origin, segments, context)))
+            except Exception as e:
+                logging.error(f"Error writing to {output_file}: {e}")
+                self._report_error(origin, output_file, e)
+            if self.queue.empty() or len(self.unflushed) >= self.queue.maxsize:
+                self._flush_outputs()
+        self._flush_outputs()
+        for output_file, output in self.outputs.items():
+            try:
+                output.close()
+            except Exception as e:
+                logging.error(f"Error closing {output_file}: {e}")
+                self._report_error(None, output_file, e)
+                # Drop the batches of the output that failed to close; they never reached disk.
+                self.unflushed = [item for item in self.unflushed if item[0] is not output]
+        self.outputs.clear()
+        self._notify_written(lambda output: True)
+
+    def _output_for(self, origin, output_file):
+        if output_file not in self.outputs:
+            self.outputs[output_file] = self.output_factory(origin, output_file, self.encode)
+        return self.outputs[output_file]
+
+    def _flush_outputs(self):
+        for output_file, output in self.outputs.items():
+            try:
+                output.flush()
+            except Exception as e:
+                logging.error(f"Error flushing {output_file}: {e}")
+                self._report_error(None, output_file, e)
+                # As on close: the output's pending batches may not have reached disk, so never report them.
+                self.unflushed = [item for item in self.unflushed if item[0] is not output]
+        self._notify_written(lambda output: output.durable_on_flush)
+
+    def _notify_written(self, is_durable):
+        written = [args for output, args in self.unflushed if is_durable(output)]
+        self.unflushed = [item for item in self.unflushed if not is_durable(item[0])]
+        if self.on_written:
+            for origin, segments, context in written:
+                try:
+                    self.on_written(origin, segments, context)
+                except Exception as e:  # e.g. the manifest database is locked
+                    output_file = segments[0][0] if segments else None
+                    logging.error(f"Error recording the batch written to {output_file}: {e}")
+                    self._report_error(origin, output_file, e)
@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from jot_corpus import SIZE_DISTRIBUTIONS, generate_jsonl
+from jot_metrics import Histogram
+from jsonl_sender import MAX_IN_FLIGHT, JSONLSender
+from jsonl_server_stub import JSONLServerStub
+from record_source import RecordSource
+from send_checkpoint import SendCheckpoint
+from token_auth import TokenAuth
+
+USERNAME = "bench"
+PASSWORD = "bench"
+
+
+class TimedSender(JSONLSender):
+    """JSONLSender that records how long each batch took from first attempt to acknowledgement."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_latency = Histogram()
+
+    def send_batch(self, start, count, body, size):
+        started = time.perf_counter()
+        super().send_batch(start, count, body, size)
+        seconds = time.perf_counter() - started
+        with self.lock:
+            self.batch_latency.add(seconds)
+
+
+def run_once(path, total_records, in_flight, compress, stub_options):
+    """Send the file once to a fresh local server stand-in and return the measurements as a dict."""
+    SendCheckpoint(path, "jsonl_server").clear()  # always measure a full transfer; `path` is a scratch copy
+    errors = []
+    with JSONLServerStub(username=USERNAME, password=PASSWORD, **stub_options) as stub:
+        auth = TokenAuth(stub.token_url, USERNAME, PASSWORD, log=lambda message: None)
+        sender = TimedSender(auth=auth, url=stub.url, max_in_flight=in_flight, compress=compress,
+                             log=lambda message, log_to_error_file=False:
+                             errors.append(message) if log_to_error_file else None)
+        started = time.perf_counter()
+        completed = sender.send(RecordSource(path), total_records)
+        elapsed = time.perf_counter() - started
+        server = stub.snapshot()
+    latency = sender.batch_latency
+    return {
+        "in_flight": in_flight,
+        "compress": compress,
+        **stub_options,
+        "completed": completed,
+        "records": sender.acked_records,
+        "seconds": round(elapsed, 3),
+        "records_per_s": round(sender.acked_records / elapsed, 1) if elapsed else 0.0,
+        "mb_per_s": round(sender.sent_bytes / 1e6 / elapsed, 2) if elapsed else 0.0,
+        "batches": latency.count,
+        "batch_p50_s": round(latency.percentile(0.5), 4),
+        "batch_p99_s": round(latency.percentile(0.99), 4),
+        "retries": sender.retries,
+        "token_refreshes": auth.refreshes,
+        "server": server,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the JSONL sender against a local server stand-in.")
+    parser.add_argument("--file", help="existing JSON/JSONL file; generated into a temp folder when omitted")
+    parser.add_argument("--records", type=int, default=50000, help="records to generate")
+    parser.add_argument("--origins", default="supplier:0.7,inhouse:0.3")
+    parser.add_argument("--tests-mean", type=int, default=20)
+    parser.add_argument("--size-dist", choices=SIZE_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--in-flight", default=str(MAX_IN_FLIGHT), help="comma separated counts")
+    parser.add_argument("--compress", action="store_true", help="gzip request bodies")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the server adds to every batch")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds per batch")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of batches answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of batches answered with 429")
+    parser.add_argument("--token-ttl", type=float, default=300.0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--results", default="jsonl_send_bench_results.jsonl",
+                        help="JSONL file the run report is appended to")
+    args = parser.parse_args()
+
+    # The sender keeps its checkpoint and reject file next to the input, so a given file is benchmarked from a
+    # copy; its own resume checkpoint must survive the runs.
+    scratch = tempfile.mkdtemp(prefix="jsonl_send_bench_")
+    if args.file:
+        path = shutil.copy(args.file, scratch)
+    else:
+        path = os.path.join(scratch, "records.jsonl")
+        total_bytes = generate_jsonl(path, args.records, args.origins, args.tests_mean,
+                                     size_distribution=args.size_dist, seed=args.seed)
+        print(f"Generated {args.records} records ({total_bytes / 1e6:.1f} MB) in {path}")
+    total_records = RecordSource(path).count()
+
+    stub_options = {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate,
+                    "throttle_rate": args.throttle_rate, "token_ttl": args.token_ttl, "seed": args.seed}
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "input": args.file or {"generated_records": args.records, "origins": args.origins,
+                               "tests_mean": args.tests_mean, "size_dist": args.size_dist, "seed": args.seed},
+        "total_records": total_records,
+        "runs": [],
+    }
+    try:
+        for in_flight in [int(count) for count in args.in_flight.split(",") if count.strip()]:
+            for repeat in range(args.repeat):
+                result = run_once(path, total_records, in_flight, args.compress, stub_options)
+                result["repeat"] = repeat
+                report["runs"].append(result)
+                print(f"in_flight={in_flight:<3} {result['records_per_s']:>10.1f} records/s "
+                      f"{result['mb_per_s']:>7.2f} MB/s  batch p50 {result['batch_p50_s'] * 1e3:.0f} ms "
+                      f"p99 {result['batch_p99_s'] * 1e3:.0f} ms  retries {result['retries']}"
+                      f"{'' if result['completed'] else '  INCOMPLETE'}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(report) + "\n")
+    print(f"Report appended to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
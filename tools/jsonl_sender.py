@@ -0,0 +1,312 @@
+import gzip
+import queue
+import random
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from record_codec import make_encoder
+from record_source import default_log
+from record_validator import REJECT_SUFFIX, RejectFile
+from send_checkpoint import SendCheckpoint
+
+JSONL_SERVER_URL = "https://127.0.0.1:5444/data"
+TOKEN_URL = "https://127.0.0.1:5444/token"
+VERIFY_TLS = False  # the server uses a self-signed certificate; set a CA bundle path to verify it
+MAX_BATCH_RECORDS = 10000  # upper bound on records per POST, whatever their size
+TARGET_LATENCY = 1.0  # seconds a POST should take; the byte target follows the observed rate toward it
+INITIAL_BATCH_BYTES = 4 << 20  # serialized (uncompressed) bytes per POST before any latency is observed
+MIN_BATCH_BYTES = 256 << 10
+MAX_BATCH_BYTES = 32 << 20
+RATE_ALPHA = 0.3  # EWMA weight of the newest bytes/s sample
+MAX_IN_FLIGHT = 4  # batches uploading concurrently
+TIMEOUT = (5, 60)  # (connect, read) seconds per request
+MAX_RETRIES = 5  # attempts after the first one for transient failures
+BACKOFF_BASE = 0.5  # seconds; doubled per attempt, with jitter
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+GZIP_LEVEL = 5
+ABORT_POLL_INTERVAL = 0.5
+
+_END = object()
+
+
+class SendError(Exception):
+    """A batch failed permanently (non-retryable status or retries exhausted)."""
+
+
+class BatchSizer:
+    """Byte target per batch, steered so a POST takes about `target_latency` at the observed upload rate.
+
+    Each acknowledgement folds its bytes/s into an EWMA and the target becomes rate x target latency, so deep
+    testinfo payloads get fewer records per batch and shallow ones more. A timeout or transient error halves
+    the target straight away.
+    """
+
+    def __init__(self, initial=INITIAL_BATCH_BYTES, minimum=MIN_BATCH_BYTES, maximum=MAX_BATCH_BYTES,
+                 target_latency=TARGET_LATENCY):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.target = initial
+        self.rate = None
+        self.lock = threading.Lock()
+
+    def observe(self, size, seconds):
+        with self.lock:
+            rate = size / max(seconds, 1e-3)
+            self.rate = rate if self.rate is None else self.rate + RATE_ALPHA * (rate - self.rate)
+            self.target = int(min(self.maximum, max(self.minimum, self.rate * self.target_latency)))
+
+    def backoff(self):
+        with self.lock:
+            self.target = max(self.minimum, self.target // 2)
+
+
+class JSONLSender:
+    """Uploads a RecordSource to the JSONL server with several batches in flight over pooled connections.
+
+    A producer thread serializes records (and optionally gzips each body) into batches of about
+    `sizer.target` bytes, so the upload threads only move bytes. Transient failures (connection errors,
+    timeouts, 408/429/5xx) are retried with exponential backoff, honouring Retry-After. Every acknowledged
+    batch's record range goes into a SendCheckpoint, so a transfer that was aborted or failed resumes with the
+    records that are still missing. Batches may be acknowledged out of order; each POST carries its first
+    record index and count in the X-Batch-Start / X-Batch-Records headers.
+
+    With a `validator` (see record_validator) the producer checks every record before serializing it. Invalid
+    records go to `<source>.rejects.jsonl` with their reasons instead of failing the whole batch server-side;
+    they count as handled in the checkpoint, so a resumed transfer does not reject them twice.
+
+    Senders working on different files can share `slots` (a semaphore) to cap their batches in flight overall.
+    """
+
+    def __init__(self, auth=None, url=JSONL_SERVER_URL, max_batch_records=MAX_BATCH_RECORDS,
+                 max_in_flight=MAX_IN_FLIGHT, timeout=TIMEOUT, max_retries=MAX_RETRIES, verify=VERIFY_TLS,
+                 compress=False, sizer=None, validator=None, slots=None, log=None, abort_event=None,
+                 on_progress=None):
+        self.auth = auth
+        self.url = url
+        self.max_batch_records = max_batch_records
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.verify = verify
+        self.compress = compress
+        self.sizer = sizer or BatchSizer()
+        self.validator = validator
+        self.slots = slots
+        self.log = log or default_log
+        self.abort_event = abort_event or threading.Event()
+        self.on_progress = on_progress  # on_progress(records acknowledged, total records), from worker threads
+        self.headers = {"Content-Type": "application/json"}
+        self.session = None
+        self.checkpoint = None
+        self.rejects = None
+        self.total_records = 0
+        self.acked_records = 0  # acknowledged by the server or rejected (and so handled)
+        self.sent_bytes = 0
+        self.retries = 0
+        self.lock = threading.Lock()
+
+    def new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def post(self, payload=None, body=None, headers=None, description="request", slots=None):
+        """POST a JSON payload or ready-made body with retries for transient failures.
+
+        `slots` (a semaphore) is held for each attempt only, so a request waiting to retry leaves its slot to
+        others. Returns the final response or raises SendError.
+        """
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                with slots if slots is not None else nullcontext():
+                    response = self.session.post(self.url, json=payload, data=body,
+                                                 headers={**self.headers, **(headers or {})}, auth=self.auth,
+                                                 timeout=self.timeout, verify=self.verify)
+                if response.status_code == 200:
+                    return response
+                if response.status_code not in RETRY_STATUSES:
+                    raise SendError(f"{description} rejected: {response.status_code} - {response.text[:200]}")
+                problem = f"status {response.status_code}"
+                retry_after = response.headers.get("Retry-After")
+            except requests.RequestException as e:  # includes a transient failure of the token endpoint
+                problem = f"{type(e).__name__}: {e}"
+                if e.response is not None:
+                    retry_after = e.response.headers.get("Retry-After")
+            if body is not None:
+                self.sizer.backoff()  # later batches get smaller; this one is resent as is
+            if attempt == self.max_retries or self.abort_event.is_set():
+                raise SendError(f"{description} failed after {attempt + 1} attempts ({problem})")
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if retry_after is not None:
+                try:
+                    delay = max(delay, float(retry_after))
+                except ValueError:
+                    pass
+            with self.lock:
+                self.retries += 1
+            self.log(f"{description}: {problem}; retrying in {delay:.1f} s.")
+            if self.abort_event.wait(delay):
+                raise SendError(f"{description} aborted while waiting to retry")
+
+    def produce(self, source, batches, stop):
+        """Producer thread: serialize the unacknowledged records into byte-targeted batches on `batches`."""
+        _, encode = make_encoder(newline=False)
+        parts, size, start = [], 0, None
+        try:
+            for index, record in enumerate(source):
+                if stop.is_set():
+                    return
+                if self.checkpoint.is_acked(index):
+                    if parts:  # batches cover contiguous record ranges only
+                        self.put_batch(batches, start, parts, size)
+                        parts, size = [], 0
+                    continue
+                if self.validator is not None:
+                    reasons = self.validator.validate(record)
+                    if reasons:
+                        if parts:
+                            self.put_batch(batches, start, parts, size)
+                            parts, size = [], 0
+                        self.reject(index, record, reasons)
+                        continue
+                try:
+                    data = encode(record)
+                except (TypeError, ValueError) as e:
+                    if parts:
+                        self.put_batch(batches, start, parts, size)
+                        parts, size = [], 0
+                    self.reject(index, record, [f"record: not serializable: {e}"])
+                    continue
+                if not parts:
+                    start = index
+                parts.append(data)
+                size += len(data) + 1
+                if size >= self.sizer.target or len(parts) >= self.max_batch_records:
+                    self.put_batch(batches, start, parts, size)
+                    parts, size = [], 0
+            if parts:
+                self.put_batch(batches, start, parts, size)
+        except Exception as e:
+            batches.put(e)
+        finally:
+            batches.put(_END)
+
+    def reject(self, index, record, reasons):
+        self.rejects.write(index, record, reasons)
+        self.checkpoint.ack(index, index + 1, persist=False)  # written with the next batch ack
+        with self.lock:
+            self.acked_records += 1
+
+    def put_batch(self, batches, start, parts, size):
+        body = b"[" + b",".join(parts) + b"]"
+        if self.compress:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        batches.put((start, len(parts), body, size))
+
+    def send_batch(self, start, count, body, size):
+        headers = {"X-Batch-Start": str(start), "X-Batch-Records": str(count)}
+        if self.compress:
+            headers["Content-Encoding"] = "gzip"
+        response = self.post(body=body, headers=headers, description=f"Records {start + 1}-{start + count}",
+                             slots=self.slots)
+        self.sizer.observe(size, response.elapsed.total_seconds())  # the successful attempt, without waits
+        self.checkpoint.ack(start, start + count)
+        with self.lock:
+            self.acked_records += count
+            self.sent_bytes += len(body)
+            acked = self.acked_records
+        self.log(f"Sent records {start + 1}-{start + count} ({len(body) / 1e6:.2f} MB).")
+        if self.on_progress is not None:
+            self.on_progress(acked, self.total_records)
+
+    def upload(self, batches):
+        """Submit batches from the producer with at most `max_in_flight` uploading; returns the first failure."""
+        failure = None
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            while failure is None and not self.abort_event.is_set():
+                if len(in_flight) >= self.max_in_flight:
+                    done, in_flight = wait(in_flight, timeout=ABORT_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                    failure = next((f.exception() for f in done if f.exception()), None)
+                    continue
+                try:
+                    batch = batches.get(timeout=ABORT_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if batch is _END:
+                    break
+                if isinstance(batch, Exception):
+                    failure = batch
+                    break
+                in_flight.add(executor.submit(self.send_batch, *batch))
+            done, _ = wait(in_flight)
+        return failure or next((f.exception() for f in done if f.exception()), None)
+
+    def send(self, source, total_records):
+        """Send every not yet acknowledged record of `source`; returns True once the server confirmed the end."""
+        self.total_records = total_records
+        self.checkpoint = SendCheckpoint(source.path, "jsonl_server")
+        resumed_records = self.checkpoint.load()
+        self.acked_records = resumed_records
+        self.rejects = RejectFile(f"{source.path}{REJECT_SUFFIX}", append=bool(resumed_records))
+        self.sent_bytes = 0
+        self.retries = 0
+        started = time.perf_counter()
+        with self.new_session() as self.session:
+            try:
+                start_msg = {"control": "start", "total_records": total_records}
+                if resumed_records:
+                    start_msg["resumed_records"] = resumed_records
+                    self.log(f"Resuming: {resumed_records} records were already acknowledged.")
+                response = self.post(start_msg, description="Start message")
+                self.log(f"Start message response: {response.status_code} - {response.text}")
+            except SendError as e:
+                self.log(f"Start message failed. Aborting data transfer. {e}", log_to_error_file=True)
+                return False
+
+            # Enough serialized batches to keep every upload slot busy, but no more.
+            batches = queue.Queue(maxsize=self.max_in_flight)
+            stop = threading.Event()
+            producer = threading.Thread(target=self.produce, args=(source, batches, stop), daemon=True)
+            producer.start()
+            failure = self.upload(batches)
+            stop.set()
+            while producer.is_alive():  # unblock a producer waiting on the full queue
+                try:
+                    batches.get(timeout=ABORT_POLL_INTERVAL)
+                except queue.Empty:
+                    pass
+            self.rejects.close()
+            self.checkpoint.persist()
+            if self.rejects.rejected:
+                self.log(f"{self.rejects.rejected} invalid records were not sent; see {self.rejects.path}.",
+                         log_to_error_file=True)
+
+            if self.abort_event.is_set():
+                self.log("Abort flag set. Halting further JSONL batches. Sending the file again resumes here.")
+                return False
+            if failure is not None:
+                self.log(f"Transfer stopped: {failure}. {self.checkpoint.acked_records} records are checkpointed; "
+                         f"sending the file again resumes after them.", log_to_error_file=True)
+                return False
+            try:
+                response = self.post({"control": "end"}, description="End message")
+            except SendError as e:
+                self.log(f"End message failed: {e}", log_to_error_file=True)
+                return False
+            self.log(f"End message response: {response.status_code} - {response.text}")
+        self.checkpoint.clear()
+        elapsed = time.perf_counter() - started
+        self.log(f"Data transfer complete: {(self.acked_records - resumed_records) / max(elapsed, 1e-9):.0f} "
+                 f"records/s, {self.sent_bytes / 1e6:.1f} MB sent, {self.retries} retries.")
+        return True
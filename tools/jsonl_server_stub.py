@@ -0,0 +1,254 @@
+import argparse
+import base64
+import gzip
+import json
+import random
+import secrets
+import ssl
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+TOKEN_TTL = 300  # seconds a handed-out token stays valid
+RETRY_AFTER = 1  # seconds announced with an injected 429
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Speaks the JSONL server protocol: GET /token, and POST /data with start/end control messages and
+    record batches (JSON arrays, optionally gzip-encoded, with X-Batch-Start / X-Batch-Records headers)."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server, so the sender's connection pool is used
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def basic_credentials(self):
+        header = self.headers.get("Authorization", "")
+        if not header.startswith("Basic "):
+            return None
+        try:
+            username, _, password = base64.b64decode(header[6:]).decode("utf-8").partition(":")
+        except ValueError:
+            return None
+        return username, password
+
+    def do_GET(self):
+        stub = self.server.stub
+        if urlsplit(self.path).path != "/token":
+            self.reply(404, {"error": "not found"})
+        elif not stub.credentials_ok(self.basic_credentials()):
+            stub.count("unauthorized")
+            self.reply(401, {"error": "invalid credentials"})
+        else:
+            self.reply(200, {"token": stub.issue_token(), "expires_in": stub.token_ttl})
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))  # always drained, for keep-alive
+        wire_size = len(body)
+        if urlsplit(self.path).path != "/data":
+            self.reply(404, {"error": "not found"})
+            return
+        header = self.headers.get("Authorization", "")
+        if not (header.startswith("Bearer ") and stub.token_ok(header[7:])
+                or stub.credentials_ok(self.basic_credentials())):
+            stub.count("unauthorized")
+            self.reply(401, {"error": "invalid or expired token"})
+            return
+        if self.headers.get("Content-Encoding") == "gzip":
+            try:
+                body = gzip.decompress(body)
+            except (OSError, EOFError):
+                self.reply(400, {"error": "bad gzip body"})
+                return
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            self.reply(400, {"error": f"invalid JSON: {e}"})
+            return
+        if isinstance(payload, dict):
+            self.reply(200, stub.control(payload))
+            return
+        if not isinstance(payload, list):
+            self.reply(400, {"error": "expected a control message or a list of records"})
+            return
+        injected = stub.inject()
+        if injected == "throttled":
+            self.reply(429, {"error": "slow down"}, {"Retry-After": str(stub.retry_after)})
+        elif injected == "error":
+            self.reply(503, {"error": "injected failure"})
+        else:
+            start = self.headers.get("X-Batch-Start")
+            self.reply(200, stub.batch(None if start is None else int(start), zlib.crc32(body), payload, wire_size,
+                                       self.headers.get("Content-Encoding") == "gzip"))
+
+
+class JSONLServerStub:
+    """Local stand-in for the JSONL server and its token endpoint, for tests and load tests.
+
+    Batch requests can be slowed down (`latency` plus up to `jitter` seconds) and answered with 503
+    (`error_rate`) or 429 with Retry-After (`throttle_rate`). Serves HTTPS when given a certificate. Received
+    batches are told apart by X-Batch-Start and a checksum of the body, so a resent batch shows up as duplicate
+    records, while concurrent transfers of different files are counted independently.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, certfile=None, keyfile=None, username=None, password=None,
+                 latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=RETRY_AFTER,
+                 token_ttl=TOKEN_TTL, seed=None):
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = {}  # token -> expiry (time.time())
+        self.seen_batches = set()  # (X-Batch-Start, body CRC-32)
+        self.stats = dict.fromkeys(("start_messages", "end_messages", "batches", "records", "duplicate_records",
+                                    "bytes", "gzip_batches", "injected_errors", "throttled", "unauthorized",
+                                    "tokens_issued"), 0)
+        self.server = ThreadingHTTPServer((host, port), StubHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.scheme = "http"
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+            self.scheme = "https"
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"{self.scheme}://{host}:{port}"
+
+    @property
+    def url(self):
+        return f"{self.base_url}/data"
+
+    @property
+    def token_url(self):
+        return f"{self.base_url}/token"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def credentials_ok(self, credentials):
+        return credentials is not None and (self.username is None
+                                            or credentials == (self.username, self.password))
+
+    def issue_token(self):
+        token = secrets.token_urlsafe(24)
+        with self.lock:
+            now = time.time()
+            self.tokens = {t: expiry for t, expiry in self.tokens.items() if expiry > now}
+            self.tokens[token] = now + self.token_ttl
+            self.stats["tokens_issued"] += 1
+        return token
+
+    def token_ok(self, token):
+        with self.lock:
+            return self.tokens.get(token, 0) > time.time()
+
+    def inject(self):
+        """Sleep for the configured latency and pick the fate of a batch: None, "throttled" or "error"."""
+        with self.lock:
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+            draw = self.rng.random()
+        if delay > 0:
+            time.sleep(delay)
+        if draw < self.throttle_rate:
+            self.count("throttled")
+            return "throttled"
+        if draw < self.throttle_rate + self.error_rate:
+            self.count("injected_errors")
+            return "error"
+        return None
+
+    def control(self, message):
+        with self.lock:
+            if message.get("control") == "start":
+                self.stats["start_messages"] += 1
+                return {"status": "ready", "total_records": message.get("total_records")}
+            if message.get("control") == "end":
+                self.stats["end_messages"] += 1
+                return {"status": "complete", "records": self.stats["records"]}
+        return {"status": "ignored"}
+
+    def batch(self, start, checksum, records, size, compressed):
+        with self.lock:
+            self.stats["batches"] += 1
+            self.stats["bytes"] += size
+            self.stats["gzip_batches"] += compressed
+            if (start, checksum) in self.seen_batches:
+                self.stats["duplicate_records"] += len(records)
+            else:
+                self.stats["records"] += len(records)
+                self.seen_batches.add((start, checksum))
+        return {"status": "ok", "records": len(records)}
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the JSONL server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5444)
+    parser.add_argument("--cert", help="PEM certificate; serves HTTPS when given")
+    parser.add_argument("--key", help="PEM private key, if not part of --cert")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every batch")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds per batch")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of batches answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of batches answered with 429")
+    parser.add_argument("--token-ttl", type=float, default=TOKEN_TTL)
+    args = parser.parse_args()
+    stub = JSONLServerStub(args.host, args.port, args.cert, args.key, args.username, args.password, args.latency,
+                           args.jitter, args.error_rate, args.throttle_rate, token_ttl=args.token_ttl)
+    print(f"Serving {stub.url} and {stub.token_url}; Ctrl+C to stop.")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+        print(json.dumps(stub.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from pathlib import Path
+
+from record_source import RecordSource, default_log
+from record_validator import REJECT_SUFFIX
+from send_checkpoint import CHECKPOINT_SUFFIX
+
+MAX_FILES = 4  # files sent at the same time
+RECORD_FILE_SUFFIXES = (".json", ".jsonl", ".jsonl.gz", ".jsonl.xz")
+# JSON files xml2json2 writes next to its record files: shard manifests and run metrics
+SIDECAR_PATTERNS = ("*.manifest.json", "*_metrics_*.json")
+
+
+def find_record_files(folder):
+    """JSON/JSONL files in `folder` (not recursive), without the sender's checkpoint and reject files and
+    xml2json2's shard manifests and metrics."""
+    return sorted(str(path) for path in Path(folder).iterdir()
+                  if path.is_file() and path.name.endswith(RECORD_FILE_SUFFIXES)
+                  and not path.name.endswith((CHECKPOINT_SUFFIX, REJECT_SUFFIX))
+                  and not any(fnmatch(path.name, pattern) for pattern in SIDECAR_PATTERNS))
+
+
+class MultiFileSender:
+    """Sends several record files concurrently, at most `max_files` at a time, and sums up the outcome.
+
+    `send(source, total_records, on_progress)` transfers one RecordSource and returns True on success; it
+    runs on a pool thread, so limits shared across files (e.g. batches in flight) belong in whatever it
+    closes over. `on_update(path, state)` reports each file's status ("queued", "counting", "sending",
+    "done", "failed", "aborted") and its sent/total records whenever they change.
+    """
+
+    def __init__(self, send, max_files=MAX_FILES, abort_event=None, log=None, on_update=None):
+        self.send = send
+        self.max_files = max_files
+        self.abort_event = abort_event or threading.Event()
+        self.log = log or default_log
+        self.on_update = on_update
+        self.lock = threading.Lock()
+        self.states = {}  # path -> {"status", "sent", "total", "error"}
+
+    def update(self, path, **changes):
+        with self.lock:
+            self.states[path].update(changes)
+            state = dict(self.states[path])
+        if self.on_update is not None:
+            self.on_update(path, state)
+
+    def totals(self):
+        """(records sent, records known) over all files, for an aggregated progress bar."""
+        with self.lock:
+            return (sum(state["sent"] for state in self.states.values()),
+                    sum(state["total"] for state in self.states.values()))
+
+    def send_file(self, path):
+        if self.abort_event.is_set():
+            self.update(path, status="aborted")
+            return
+        try:
+            self.update(path, status="counting")
+            source = RecordSource(path)
+            total_records = source.count()
+            self.update(path, status="sending", total=total_records)
+            ok = self.send(source, total_records, lambda sent, total: self.update(path, sent=sent))
+        except Exception as e:
+            self.log(f"{os.path.basename(path)}: {e}", log_to_error_file=True)
+            self.update(path, status="failed", error=str(e))
+            return
+        if ok:
+            self.update(path, status="done", sent=total_records)
+        else:
+            self.update(path, status="aborted" if self.abort_event.is_set() else "failed")
+
+    def run(self, paths):
+        """Send every file; returns the summary (see `summarize`)."""
+        with self.lock:
+            self.states = {path: {"status": "queued", "sent": 0, "total": 0, "error": None} for path in paths}
+        for path in paths:
+            self.update(path)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_files) as executor:
+            list(executor.map(self.send_file, paths))
+        return self.summarize(paths, time.perf_counter() - started)
+
+    def summarize(self, paths, seconds):
+        with self.lock:
+            states = {path: dict(state) for path, state in self.states.items()}
+        done = [path for path in paths if states[path]["status"] == "done"]
+        records = sum(state["sent"] for state in states.values())
+        input_bytes = sum(os.path.getsize(path) for path in done)
+        return {
+            "files": len(paths),
+            "done": len(done),
+            "failed": [(path, states[path]["error"]) for path in paths if states[path]["status"] == "failed"],
+            "aborted": [path for path in paths if states[path]["status"] == "aborted"],
+            "records": records,
+            "input_bytes": input_bytes,
+            "seconds": round(seconds, 3),
+            "records_per_s": round(records / seconds, 1) if seconds else 0.0,
+            "mb_per_s": round(input_bytes / 1e6 / seconds, 2) if seconds else 0.0,
+        }
+
+    def log_summary(self, summary):
+        self.log(f"{summary['done']}/{summary['files']} files sent: {summary['records']} records in "
+                 f"{summary['seconds']:.1f} s ({summary['records_per_s']:.0f} records/s, "
+                 f"{summary['mb_per_s']:.2f} MB/s of input).")
+        for path, error in summary["failed"]:
+            self.log(f"Failed: {os.path.basename(path)}{f' ({error})' if error else ''}", log_to_error_file=True)
+        if summary["aborted"]:
+            self.log(f"Not sent (aborted): {len(summary['aborted'])} files.")
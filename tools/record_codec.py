@@ -0,0 +1,80 @@
+import json
+
+try:
+    import orjson  # optional, several times faster than the stdlib encoder
+except ImportError:
+    orjson = None
+
+# Order of the values `test_row` returns for one testinfo entry.
+TEST_ROW_FIELDS = ("id", "description", "value", "value_text", "limit_low", "limit_high", "unit", "ok")
+
+
+def make_encoder(fast_json=True, newline=True):
+    """Return (name, encode) where encode(record) gives compact UTF-8 JSON bytes, a JSONL line with `newline`.
+
+    orjson rejects what the stdlib encoder accepts in a few cases (integers wider than 64 bits); such a record
+    is encoded with the stdlib encoder instead of failing its whole batch.
+    """
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    end = "\n" if newline else ""
+
+    def encode_json(record):
+        return (encoder.encode(record) + end).encode("utf-8")
+
+    if fast_json and orjson is not None:
+        option = orjson.OPT_APPEND_NEWLINE if newline else None
+
+        def encode_orjson(record):
+            try:
+                return orjson.dumps(record, option=option)
+            except TypeError:  # orjson.JSONEncodeError
+                return encode_json(record)
+        return "orjson", encode_orjson
+    return "json", encode_json
+
+
+def as_text(value):
+    return None if value is None else str(value)
+
+
+def as_int(value):
+    try:
+        return None if value is None or value == "" else int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def as_number(value):
+    if value is None or isinstance(value, (int, float)):
+        return None if value is None else float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def as_bool(value):
+    if value is None or isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("true", "1", "yes", "ok", "pass", "passed")
+
+
+def test_row(test):
+    """A testinfo entry flattened to typed column values, in TEST_ROW_FIELDS order.
+
+    Numeric and boolean values go to `value` (booleans as 1.0/0.0), anything else to `value_text`; `limits`
+    becomes `limit_low`/`limit_high`.
+    """
+    value = test.get("value")
+    number = as_number(value)
+    limits = test.get("limits") or []
+    return (
+        as_text(test.get("id")),
+        as_text(test.get("description")),
+        number,
+        as_text(value) if number is None and value is not None else None,
+        as_number(limits[0]) if len(limits) > 0 else None,
+        as_number(limits[1]) if len(limits) > 1 else None,
+        as_text(test.get("unit")),
+        as_bool(test.get("ok")),
+    )
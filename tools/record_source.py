@@ -0,0 +1,119 @@
+import gzip
+import json
+import logging
+import lzma
+from itertools import islice
+
+import jsonlines
+
+READ_CHUNK = 1 << 20  # characters read at a time from a JSON array file
+MAX_RECORD_CHARS = 256 << 20  # a record that still does not parse at this size is treated as invalid JSON
+_WHITESPACE = " \t\r\n"
+
+
+def default_log(message, log_to_error_file=False):
+    """Log callback of the senders and loaders when the caller gives none."""
+    (logging.error if log_to_error_file else logging.info)(message)
+
+
+def open_text(path):
+    """Open a JSON/JSONL file for reading as text, transparently decompressing .gz and .xz shards."""
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".xz"):
+        return lzma.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def is_jsonl(path):
+    return str(path).removesuffix(".gz").removesuffix(".xz").endswith(".jsonl")
+
+
+def iter_json_array(fp, chunk_size=READ_CHUNK):
+    """Yield the elements of a top-level JSON array one at a time, holding only about one chunk in memory."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill(minimum=1):
+        # Drop what is consumed and read until at least `minimum` unread characters (or EOF) are buffered.
+        nonlocal buffer, pos, eof
+        buffer = buffer[pos:]
+        pos = 0
+        while not eof and len(buffer) < minimum:
+            chunk = fp.read(max(chunk_size, len(buffer)))  # grow geometrically for records larger than a chunk
+            eof = not chunk
+            buffer += chunk
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise ValueError("Invalid JSON format: Expected a list of records.")
+    pos += 1
+    skip_whitespace()
+    if pos < len(buffer) and buffer[pos] == "]":
+        return
+    while True:
+        skip_whitespace()
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+            if end == len(buffer) and not eof:
+                raise json.JSONDecodeError("value may continue in the next chunk", buffer, end)
+        except json.JSONDecodeError:
+            if eof or len(buffer) - pos > MAX_RECORD_CHARS:
+                raise
+            fill(len(buffer) - pos + 1)
+            continue
+        pos = end
+        yield record
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise json.JSONDecodeError("Unterminated array", buffer, pos)
+        if buffer[pos] == "]":
+            return
+        if buffer[pos] != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+        pos += 1
+
+
+class RecordSource:
+    """Streams the records of a JSON array or JSONL file (optionally .gz/.xz) without loading the file.
+
+    Iterating opens the file afresh, so a source can be counted first and then sent, or sent again.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.jsonl = is_jsonl(self.path)
+
+    def __iter__(self):
+        with open_text(self.path) as fp:
+            if self.jsonl:
+                with jsonlines.Reader(fp) as reader:
+                    yield from reader.iter(skip_empty=True)
+            else:
+                yield from iter_json_array(fp)
+
+    def count(self):
+        """Number of records. For JSONL only non-blank lines are counted (cheap, nothing is parsed);
+        a JSON array is parsed once, which also validates it."""
+        if not self.jsonl:
+            return sum(1 for _ in self)
+        with open_text(self.path) as fp:
+            return sum(1 for line in fp if line.strip())
+
+    def batches(self, batch_size):
+        """Yield lists of up to `batch_size` records."""
+        records = iter(self)
+        while batch := list(islice(records, batch_size)):
+            yield batch
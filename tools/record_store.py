@@ -0,0 +1,230 @@
+import json
+from array import array
+from itertools import repeat
+
+# Value kinds, one byte per value. Each kind's payloads live in their own array and are read sequentially, so
+# a value only takes the space its kind needs (a boolean or null takes none).
+ABSENT, NONE, STR, INT, FLOAT, FALSE, TRUE, FLOATS, JSON = range(9)
+INT_RANGE = (-2 ** 63, 2 ** 63 - 1)  # ints outside a signed 64-bit slot are stored as JSON text
+BATCH_ROWS = 256  # records materialized at a time while iterating; few live dicts keep GC passes cheap
+_ABSENT = object()  # placeholder for a key the object did not have
+
+
+class StringTable:
+    """Interns strings: each distinct string is stored once and referenced by its id."""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def id(self, text):
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class Column:
+    """One key's values: a kind per row plus the payloads of the kinds that carry one."""
+
+    __slots__ = ("kinds", "strs", "ints", "floats", "lengths", "pool", "jsons")
+
+    def __init__(self, rows):
+        self.kinds = array("B", bytes(rows))  # rows before the key first appeared are ABSENT
+        self.strs = array("I")  # STR, as string ids
+        self.ints = array("q")  # INT
+        self.floats = array("d")  # FLOAT
+        self.lengths = array("I")  # FLOATS: list lengths ...
+        self.pool = array("d")  # ... and their values
+        self.jsons = array("I")  # JSON, as ids of the encoded text
+
+    def nbytes(self):
+        return sum(values.itemsize * len(values) for values in
+                   (self.kinds, self.strs, self.ints, self.floats, self.lengths, self.pool, self.jsons))
+
+
+class ColumnTable:
+    """Flat JSON objects stored column-wise, with interned strings and typed arrays instead of Python objects.
+
+    Rows are materialized a range at a time (`materialize(cursor, start, stop)`, in order): each column is decoded
+    with slice operations where its kinds are uniform, then the dicts are zipped together. Materialized rows
+    contain exactly the keys and value types that were appended.
+    """
+
+    def __init__(self, strings):
+        self.strings = strings
+        self.columns = {}  # key -> Column
+        self.rows = 0
+
+    def append(self, obj, skip=None):
+        rows = self.rows
+        for key, value in obj.items():
+            if key == skip:
+                continue
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = Column(rows)
+            kind = type(value)
+            if kind is str:
+                column.kinds.append(STR)
+                column.strs.append(self.strings.id(value))
+            elif kind is float:
+                column.kinds.append(FLOAT)
+                column.floats.append(value)
+            elif kind is bool:
+                column.kinds.append(TRUE if value else FALSE)
+            elif value is None:
+                column.kinds.append(NONE)
+            elif kind is int and INT_RANGE[0] <= value <= INT_RANGE[1]:
+                column.kinds.append(INT)
+                column.ints.append(value)
+            elif kind is list and value and all(type(item) is float for item in value):
+                column.kinds.append(FLOATS)
+                column.lengths.append(len(value))
+                column.pool.extend(value)
+            else:
+                column.kinds.append(JSON)
+                column.jsons.append(self.strings.id(json.dumps(value, ensure_ascii=False)))
+        self.rows = rows = rows + 1
+        for column in self.columns.values():
+            if len(column.kinds) < rows:  # key missing from this object
+                column.kinds.append(ABSENT)
+
+    def new_cursor(self):
+        """Read positions in each column's payload arrays, for materializing rows from the first one on."""
+        return {}
+
+    def decode(self, column, position, start, stop):
+        """Values of rows start..stop of a column; `position` (read offset per payload array) is advanced.
+
+        Each kind present is decoded in one go with slice/map operations; a column mixing kinds is then
+        merged by pulling from the per-kind lists in row order.
+        """
+        kinds = column.kinds[start:stop].tobytes()
+        strings = self.strings.strings
+        decoded = {}
+        for kind, values, index in ((STR, column.strs, 0), (INT, column.ints, 1), (FLOAT, column.floats, 2),
+                                    (JSON, column.jsons, 3)):
+            count = kinds.count(kind)
+            if count:
+                chunk = values[position[index]:position[index] + count]
+                position[index] += count
+                if kind == STR:
+                    decoded[kind] = list(map(strings.__getitem__, chunk))
+                elif kind == JSON:
+                    decoded[kind] = [json.loads(strings[string_id]) for string_id in chunk]
+                else:
+                    decoded[kind] = chunk.tolist()
+        count = kinds.count(FLOATS)
+        if count:
+            lengths = column.lengths[position[4]:position[4] + count]
+            pool = column.pool[position[5]:position[5] + sum(lengths)].tolist()
+            position[4] += count
+            position[5] += len(pool)
+            if lengths.count(lengths[0]) == count:  # e.g. all [low, high] limits
+                width = lengths[0]
+                decoded[FLOATS] = [pool[offset:offset + width] for offset in range(0, len(pool), width)]
+            else:
+                offsets = [0]
+                for length in lengths:
+                    offsets.append(offsets[-1] + length)
+                decoded[FLOATS] = [pool[offsets[i]:offsets[i + 1]] for i in range(count)]
+        if len(decoded) == 1 and len(decoded[next(iter(decoded))]) == len(kinds):
+            return next(iter(decoded.values()))  # a single kind with payloads
+        constants = (_ABSENT, None, None, None, None, False, True)
+        pull = [repeat(constants[kind]).__next__ if kind in (ABSENT, NONE, FALSE, TRUE)
+                else iter(decoded.get(kind, ())).__next__ for kind in range(JSON + 1)]
+        return [pull[kind]() for kind in kinds]
+
+    def materialize(self, cursor, start, stop):
+        """Rows start..stop as dicts; rows must be requested in order with the same cursor."""
+        keys, values = [], []
+        absent = {}  # row -> keys the object did not have
+        for key, column in self.columns.items():
+            position = cursor.setdefault(key, [0] * 6)
+            keys.append(key)
+            values.append(self.decode(column, position, start, stop))
+            kinds = column.kinds[start:stop].tobytes()
+            row = kinds.find(ABSENT)
+            while row != -1:
+                absent.setdefault(row, []).append(key)
+                row = kinds.find(ABSENT, row + 1)
+        if not keys:
+            return [{} for _ in range(stop - start)]
+        rows = [dict(zip(keys, row)) for row in zip(*values)]
+        for row, missing in absent.items():
+            for key in missing:
+                del rows[row][key]
+        return rows
+
+    def nbytes(self):
+        return sum(column.nbytes() for column in self.columns.values())
+
+
+class CompactRecordStore:
+    """Jot records held in memory column-wise, with their testinfo entries in a child table.
+
+    A drop-in for RecordSource (`path`, iteration, `count()`, `batches()`) that parses the file once and then
+    serves every send from memory; records are only materialized as dicts, batch by batch, when iterated.
+    A record whose testinfo is not a list of objects keeps it as an ordinary (JSON-encoded) field.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.strings = StringTable()
+        self.records = ColumnTable(self.strings)
+        self.tests = ColumnTable(self.strings)
+        self.test_offsets = array("Q", [0])  # record i's tests are rows test_offsets[i]:test_offsets[i + 1]
+        self.has_tests = array("B")  # 1 if the record's testinfo lives in the child table
+
+    @classmethod
+    def from_source(cls, source):
+        store = cls(source.path)
+        for record in source:
+            store.append(record)
+        return store
+
+    def append(self, record):
+        tests = record.get("testinfo")
+        child = type(tests) is list and all(type(test) is dict for test in tests)
+        self.records.append(record, skip="testinfo" if child else None)
+        if child:
+            for test in tests:
+                self.tests.append(test)
+        self.has_tests.append(child)
+        self.test_offsets.append(self.tests.rows)
+
+    def __len__(self):
+        return self.records.rows
+
+    def __iter__(self):
+        for batch in self.batches(BATCH_ROWS):
+            yield from batch
+
+    def count(self):
+        return self.records.rows
+
+    def batches(self, batch_size):
+        """Yield lists of up to `batch_size` materialized records."""
+        record_cursor = self.records.new_cursor()
+        test_cursor = self.tests.new_cursor()
+        offsets = self.test_offsets
+        for start in range(0, self.records.rows, batch_size):
+            stop = min(start + batch_size, self.records.rows)
+            records = self.records.materialize(record_cursor, start, stop)
+            base = offsets[start]
+            tests = self.tests.materialize(test_cursor, base, offsets[stop])
+            for index, record in enumerate(records, start):
+                if self.has_tests[index]:
+                    record["testinfo"] = tests[offsets[index] - base:offsets[index + 1] - base]
+            yield records
+
+    def nbytes(self):
+        """Approximate memory held: column arrays plus the interned strings."""
+        arrays = (self.records.nbytes() + self.tests.nbytes()
+                  + self.test_offsets.itemsize * len(self.test_offsets) + len(self.has_tests))
+        return arrays + sum(len(text) + 49 for text in self.strings.strings) + 100 * len(self.strings)
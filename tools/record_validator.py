@@ -0,0 +1,156 @@
+import json
+import math
+from datetime import datetime
+
+# Record field -> (check name, required). Mirrors the record shape of `json_record` in batch_send2db.py, i.e.
+# what xml2json2 writes: optional fields may be missing or null, required ones must be present and non-empty.
+RECORD_SCHEMA = {
+    "sn": ("str", True),
+    "origin": ("str", True),
+    "ItemNr": ("str", False),
+    "WorkPlan": ("str", False),
+    "WorkPlanIndex": ("int", False),
+    "bom_name": ("str", False),
+    "bom_index": ("int", False),
+    "serie": ("str", False),
+    "timestamp": ("timestamp", True),
+    "verification": ("bool", False),
+    "comment": ("str", False),
+    "status": ("str", False),
+}
+# Entries of the record's "testinfo" list.
+TEST_SCHEMA = {
+    "id": ("str", True),
+    "description": ("str", False),
+    "limits": ("limits", False),
+    "value": ("value", False),
+    "unit": ("str", False),
+    "ok": ("bool", False),
+}
+REJECT_SUFFIX = ".rejects.jsonl"
+
+
+def _check_str(value):
+    return None if type(value) is str else "not a string"
+
+
+def _check_int(value):
+    return None if type(value) is int else "not an integer"
+
+
+def _check_number(value):
+    if type(value) is int or type(value) is float and math.isfinite(value):
+        return None
+    return "not a finite number"
+
+
+def _check_bool(value):
+    return None if type(value) is bool else "not a boolean"
+
+
+def _check_timestamp(value):
+    if type(value) is not str:
+        return "not a string"
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return f"not an ISO timestamp: {value!r}"
+    return None
+
+
+def _check_limits(value):
+    if type(value) is not list or len(value) > 2:
+        return "not a list of at most two limits"
+    for limit in value:
+        if limit is not None and _check_number(limit):
+            return f"non-numeric limit {limit!r}"
+    return None
+
+
+def _check_value(value):
+    if type(value) in (str, bool, int) or type(value) is float and math.isfinite(value):
+        return None
+    return "not a number, boolean or string"
+
+
+CHECKS = {
+    "str": _check_str,
+    "int": _check_int,
+    "number": _check_number,
+    "bool": _check_bool,
+    "timestamp": _check_timestamp,
+    "limits": _check_limits,
+    "value": _check_value,
+}
+
+
+def _compile(schema):
+    return tuple((field, CHECKS[check], required) for field, (check, required) in schema.items())
+
+
+class RecordValidator:
+    """Checks records against RECORD_SCHEMA/TEST_SCHEMA, compiled once into a flat tuple of field checks.
+
+    `validate(record)` returns None for a valid record, so the common case costs one dict lookup and one type
+    test per field; only invalid records build a list of reasons.
+    """
+
+    def __init__(self, record_schema=RECORD_SCHEMA, test_schema=TEST_SCHEMA):
+        self.record_checks = _compile(record_schema)
+        self.test_checks = _compile(test_schema)
+
+    def validate(self, record):
+        """None if the record is valid, else a list of reasons such as "sn: missing"."""
+        if type(record) is not dict:
+            return ["record: not an object"]
+        reasons = None
+        for field, check, required in self.record_checks:
+            value = record.get(field)
+            if value is None or value == "" and required:
+                if required:
+                    reasons = (reasons or []) + [f"{field}: missing"]
+                continue
+            problem = check(value)
+            if problem:
+                reasons = (reasons or []) + [f"{field}: {problem}"]
+        tests = record.get("testinfo")
+        if tests is None:
+            return reasons
+        if type(tests) is not list:
+            return (reasons or []) + ["testinfo: not a list"]
+        for index, test in enumerate(tests):
+            if type(test) is not dict:
+                reasons = (reasons or []) + [f"testinfo[{index}]: not an object"]
+                continue
+            for field, check, required in self.test_checks:
+                value = test.get(field)
+                if value is None or value == "" and required:
+                    if required:
+                        reasons = (reasons or []) + [f"testinfo[{index}].{field}: missing"]
+                    continue
+                problem = check(value)
+                if problem:
+                    reasons = (reasons or []) + [f"testinfo[{index}].{field}: {problem}"]
+        return reasons
+
+
+class RejectFile:
+    """JSONL file of rejected records with their index in the source and the reasons; opened on first use."""
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.mode = "a" if append else "w"
+        self.fp = None
+        self.rejected = 0
+
+    def write(self, index, record, reasons):
+        if self.fp is None:
+            self.fp = open(self.path, self.mode, encoding="utf-8")
+        self.fp.write(json.dumps({"index": index, "reasons": reasons, "record": record}, ensure_ascii=False,
+                                 default=str) + "\n")
+        self.rejected += 1
+
+    def close(self):
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
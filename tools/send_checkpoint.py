@@ -0,0 +1,96 @@
+import bisect
+import json
+import os
+import threading
+from datetime import datetime
+
+CHECKPOINT_SUFFIX = ".send_checkpoint.json"
+
+
+class SendCheckpoint:
+    """Acknowledged record ranges of one source file sent to one target, persisted after every acknowledgement.
+
+    Ranges are half-open [start, end) record indices, merged as they arrive, so the checkpoint stays small and
+    does not depend on how the records were batched. The checkpoint lives next to the source
+    (`<source>.<target>.send_checkpoint.json`) and is only trusted while the source's size and mtime are
+    unchanged.
+
+    Acknowledgements made with `persist=False` (e.g. single rejected records) are only written with the next
+    persisted one, or by `persist()`.
+    """
+
+    def __init__(self, source_path, target, path=None):
+        self.source_path = str(source_path)
+        self.target = target
+        self.path = path or f"{self.source_path}.{target}{CHECKPOINT_SUFFIX}"
+        stat = os.stat(self.source_path)
+        self.identity = {"source": os.path.abspath(self.source_path), "size": stat.st_size,
+                         "mtime_ns": stat.st_mtime_ns, "target": target}
+        self.lock = threading.Lock()
+        self.starts = []  # sorted, non-overlapping, non-adjacent ranges as two parallel lists
+        self.ends = []
+        self.dirty = False  # ranges acknowledged since the file was last written
+
+    def load(self):
+        """Read an existing checkpoint; returns the number of records already acknowledged (0 if none/stale)."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if any(data.get(key) != value for key, value in self.identity.items()):
+            return 0  # the file changed; start over
+        for start, end in data.get("acked", []):
+            self._merge(start, end)
+        return self.acked_records
+
+    @property
+    def acked_records(self):
+        return sum(end - start for start, end in zip(self.starts, self.ends))
+
+    def is_acked(self, index):
+        position = bisect.bisect_right(self.starts, index) - 1
+        return position >= 0 and index < self.ends[position]
+
+    def ack(self, start, end, persist=True):
+        """Mark records [start, end) as acknowledged and, with `persist`, write the checkpoint."""
+        with self.lock:
+            self._merge(start, end)
+            self.dirty = True
+            if persist:
+                self._save()
+
+    def persist(self):
+        """Write acknowledgements still held back by `ack(..., persist=False)`."""
+        with self.lock:
+            if self.dirty:
+                self._save()
+
+    def _merge(self, start, end):
+        left = bisect.bisect_left(self.ends, start)  # first range that ends at or after `start`
+        right = bisect.bisect_right(self.starts, end)  # ranges from here on start after `end`
+        if left < right:
+            start = min(start, self.starts[left])
+            end = max(end, self.ends[right - 1])
+        self.starts[left:right] = [start]
+        self.ends[left:right] = [end]
+
+    def _save(self):
+        data = {**self.identity, "acked": [[start, end] for start, end in zip(self.starts, self.ends)],
+                "updated": datetime.now().isoformat()}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def clear(self):
+        """Remove the checkpoint once the transfer completed."""
+        with self.lock:
+            self.starts.clear()
+            self.ends.clear()
+            self.dirty = False
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,166 @@
+import logging
+import re
+import threading
+import time
+
+from jot_metrics import CountHistogram, Histogram
+
+try:
+    import sqlparse  # optional, only used to reindent statements that are actually logged
+except ImportError:
+    sqlparse = None
+
+SAMPLE_RATE = 0.01  # share of statements logged at DEBUG; 0 disables statement logging
+SLOW_STATEMENT = 1.0  # seconds; slower statements are logged at INFO whatever the sample rate
+MAX_TRACE_PARAMS = 50  # parameters substituted into a logged statement; the rest of the statement is cut
+_STATEMENT_KEY = re.compile(r'\s*(\w+)(?:\s+(?:INTO|FROM|TABLE(?:\s+IF\s+NOT\s+EXISTS)?))?\s+"?(\w+)', re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|\?")
+
+
+def statement_key(sql):
+    """Operation and table of a statement, e.g. 'INSERT jot_records', used to group the histograms."""
+    match = _STATEMENT_KEY.match(sql)
+    return f"{match.group(1).upper()} {match.group(2)}" if match else sql.split(None, 1)[0].upper()
+
+
+def sql_literal(value):
+    """A parameter value written as an SQL literal, for reading only."""
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if value is None:
+        return "NULL"
+    return str(value)
+
+
+class LazyQuery:
+    """A statement with its parameters substituted, rendered only when a log record is actually emitted.
+
+    Supports named (`%(key)s`) and positional (`%s`, `?`) parameters. Only the first MAX_TRACE_PARAMS
+    placeholders are filled in, so a multi-row INSERT with thousands of parameters stays cheap to log.
+    """
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+
+    def __str__(self):
+        params = self.params or ()
+        positional = iter(params) if not isinstance(params, dict) else None
+        parts, last = [], 0
+        for count, match in enumerate(_PLACEHOLDER.finditer(self.sql)):
+            if count == MAX_TRACE_PARAMS:
+                parts.append(self.sql[last:match.start()] + f" ... ({len(params) - count} more parameters)")
+                last = None
+                break
+            if match.group(1) is not None and positional is None:
+                value = params.get(match.group(1))
+            elif positional is not None:
+                value = next(positional, None)
+            else:
+                continue
+            parts.append(self.sql[last:match.start()] + sql_literal(value))
+            last = match.end()
+        if last is not None:
+            parts.append(self.sql[last:])
+        text = "".join(parts)
+        return sqlparse.format(text, reindent=True) if sqlparse is not None else text
+
+
+class SQLTracer:
+    """Per-statement latency and row-count histograms plus sampled, lazily formatted statement logging.
+
+    Timing costs two clock reads and a histogram update per statement, so tracing can stay on during bulk
+    loads. Every `1 / sample_rate`-th statement is logged at DEBUG on the `sql` logger, formatted only if
+    that logger would emit it; statements slower than `slow_seconds` are always logged at INFO.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, slow_seconds=SLOW_STATEMENT, logger=None):
+        self.interval = round(1 / sample_rate) if sample_rate > 0 else 0
+        self.slow_seconds = slow_seconds
+        self.logger = logger or logging.getLogger("sql")
+        self.lock = threading.Lock()
+        self.latency = {}  # statement key -> Histogram
+        self.rows = {}  # statement key -> CountHistogram
+        self.statements = 0
+
+    def trace(self, sql, params, seconds, rows):
+        key = statement_key(sql)
+        with self.lock:
+            self.statements += 1
+            sampled = self.interval and self.statements % self.interval == 0
+            if key not in self.latency:
+                self.latency[key] = Histogram()
+                self.rows[key] = CountHistogram()
+            self.latency[key].add(seconds)
+            self.rows[key].add(max(rows, 0))
+        if self.slow_seconds is not None and seconds >= self.slow_seconds:
+            self.logger.info("Slow statement (%.3f s, %d rows):\n%s", seconds, rows, LazyQuery(sql, params))
+        elif sampled:
+            self.logger.debug("Executing query (%.3f s, %d rows):\n%s", seconds, rows, LazyQuery(sql, params))
+
+    def snapshot(self):
+        with self.lock:
+            return {"statements": self.statements,
+                    "by_statement": {key: {"latency": self.latency[key].snapshot(),
+                                           "rows": self.rows[key].snapshot()} for key in self.latency}}
+
+    def log_summary(self, log):
+        with self.lock:
+            for key, latency in sorted(self.latency.items(), key=lambda item: -item[1].total):
+                rows = self.rows[key]
+                log(f"{key}: {latency.count} statements, {latency.total:.2f} s, "
+                    f"p50 {latency.percentile(0.5) * 1e3:.1f} ms, p99 {latency.percentile(0.99) * 1e3:.1f} ms, "
+                    f"{int(rows.total)} rows")
+
+
+class TracedCursor:
+    """DB-API cursor wrapper that reports every execute/executemany/copy_expert to a SQLTracer."""
+
+    def __init__(self, cursor, tracer):
+        self.cursor = cursor
+        self.tracer = tracer
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        result = self.cursor.execute(sql) if params is None else self.cursor.execute(sql, params)
+        self.tracer.trace(sql, params, time.perf_counter() - started, self.cursor.rowcount)
+        return result
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        started = time.perf_counter()
+        result = self.cursor.executemany(sql, seq_of_params)
+        self.tracer.trace(sql, seq_of_params[0] if seq_of_params else None, time.perf_counter() - started,
+                          self.cursor.rowcount)
+        return result
+
+    def __getattr__(self, name):
+        attribute = getattr(self.cursor, name)
+        if name != "copy_expert":
+            return attribute
+
+        def copy_expert(sql, file, *args, **kwargs):
+            started = time.perf_counter()
+            result = attribute(sql, file, *args, **kwargs)
+            self.tracer.trace(sql, None, time.perf_counter() - started, self.cursor.rowcount)
+            return result
+        return copy_expert
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+
+class TracedConnection:
+    """DB-API connection wrapper whose cursors are traced; everything else goes to the wrapped connection."""
+
+    def __init__(self, connection, tracer):
+        self.connection = connection
+        self.tracer = tracer
+
+    def cursor(self, *args, **kwargs):
+        return TracedCursor(self.connection.cursor(*args, **kwargs), self.tracer)
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
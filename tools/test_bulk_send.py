@@ -0,0 +1,109 @@
+import json
+import sqlite3
+import threading
+
+import pytest
+
+import jsonl_sender
+from bulk_loader import RECORDS_TABLE, TESTINFO_TABLE, BulkLoader
+from jsonl_sender import JSONLSender
+from jsonl_server_stub import JSONLServerStub
+from record_source import RecordSource
+from send_checkpoint import CHECKPOINT_SUFFIX
+from token_auth import TokenAuth, TokenError
+
+RECORDS = 50
+USERNAME, PASSWORD = "user", "secret"
+
+
+def _quiet(message, log_to_error_file=False):
+    pass
+
+
+@pytest.fixture
+def jot_file(tmp_path):
+    path = tmp_path / "jots.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for index in range(RECORDS):
+            record = {"sn": f"SN{index:04d}", "timestamp": "2024-01-01T00:00:00", "origin": "line1",
+                      "WorkPlanIndex": "3", "verification": "true",
+                      "testinfo": [{"id": "U1", "value": "1.5", "limits": ["1", "2"], "unit": "V", "ok": "pass"},
+                                   {"id": "FW", "value": "v2.1"}]}
+            f.write(json.dumps(record) + "\n")
+    return path
+
+
+def _counts(connection):
+    return tuple(connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                 for table in (RECORDS_TABLE, TESTINFO_TABLE))
+
+
+def test_bulk_load_twice_is_idempotent(tmp_path, jot_file):
+    connection = sqlite3.connect(tmp_path / "jots.sqlite")
+    for _ in range(2):
+        loader = BulkLoader(connection, transaction_records=7, rows_per_statement=5, log=_quiet)
+        loader.create_tables()
+        assert loader.load(RecordSource(jot_file), RECORDS)
+    assert _counts(connection) == (RECORDS, 2 * RECORDS)
+    assert connection.execute(f'SELECT "value", value_text, limit_low, limit_high, ok FROM {TESTINFO_TABLE} '
+                              f"WHERE sn = 'SN0003' ORDER BY test_index").fetchall() == [
+        (1.5, None, 1.0, 2.0, 1), (None, "v2.1", None, None, None)]
+    assert not (tmp_path / f"jots.jsonl.db{CHECKPOINT_SUFFIX}").exists()
+
+
+def test_bulk_load_resumes_after_abort(tmp_path, jot_file):
+    connection = sqlite3.connect(tmp_path / "jots.sqlite")
+    abort_event = threading.Event()
+    loader = BulkLoader(connection, transaction_records=10, log=_quiet, abort_event=abort_event,
+                        on_progress=lambda loaded, total: abort_event.set())
+    loader.create_tables()
+    assert not loader.load(RecordSource(jot_file), RECORDS)
+    assert _counts(connection) == (10, 20)
+
+    progress = []
+    loader = BulkLoader(connection, transaction_records=10, log=_quiet,
+                        on_progress=lambda loaded, total: progress.append(loaded))
+    assert loader.load(RecordSource(jot_file), RECORDS)
+    assert progress == [20, 30, 40, 50]  # the committed first transaction is not loaded again
+    assert _counts(connection) == (RECORDS, 2 * RECORDS)
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(jsonl_sender, "BACKOFF_BASE", 0.01)
+
+
+def _sender(stub, auth=None):
+    auth = auth or TokenAuth(stub.token_url, USERNAME, PASSWORD, log=_quiet)
+    return JSONLSender(auth=auth, url=stub.url, max_batch_records=5, max_in_flight=2, max_retries=20, log=_quiet)
+
+
+@pytest.mark.parametrize("faults", [{"error_rate": 0.4}, {"throttle_rate": 0.4}])
+def test_sender_retries_injected_failures(jot_file, fast_retries, faults):
+    with JSONLServerStub(username=USERNAME, password=PASSWORD, retry_after=0, seed=1, **faults) as stub:
+        sender = _sender(stub)
+        assert sender.send(RecordSource(jot_file), RECORDS)
+        stats = stub.snapshot()
+    assert stats["records"] == RECORDS
+    assert stats["injected_errors"] + stats["throttled"] > 0
+    assert sender.retries == stats["injected_errors"] + stats["throttled"]
+
+
+def test_sender_refreshes_a_rejected_token(jot_file, fast_retries):
+    with JSONLServerStub(username=USERNAME, password=PASSWORD) as stub:
+        auth = TokenAuth(stub.token_url, USERNAME, PASSWORD, log=_quiet)
+        auth.token()
+        stub.tokens.clear()  # the server forgets the cached token, so the first request gets a 401
+        assert _sender(stub, auth=auth).send(RecordSource(jot_file), RECORDS)
+        stats = stub.snapshot()
+    assert stats["records"] == RECORDS
+    assert stats["unauthorized"] == 1
+    assert stats["tokens_issued"] == 2
+
+
+def test_sender_stops_on_bad_credentials(jot_file, fast_retries):
+    with JSONLServerStub(username=USERNAME, password=PASSWORD) as stub:
+        auth = TokenAuth(stub.token_url, USERNAME, "wrong", log=_quiet)
+        with pytest.raises(TokenError):
+            _sender(stub, auth=auth).send(RecordSource(jot_file), RECORDS)
+        assert stub.snapshot()["records"] == 0
@@ -0,0 +1,109 @@
+import base64
+import json
+import logging
+import threading
+import time
+
+import requests
+from requests.auth import AuthBase, HTTPBasicAuth
+
+DEFAULT_TOKEN_TTL = 300  # seconds assumed when the server states no expiry
+REFRESH_MARGIN = 30  # refresh this many seconds before the token expires (at most a quarter of its lifetime)
+TOKEN_TIMEOUT = (5, 30)
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}  # token endpoint answers worth retrying
+
+
+class TokenError(Exception):
+    """The token endpoint did not hand out a token."""
+
+
+class TransientTokenError(TokenError, requests.RequestException):
+    """The token endpoint was temporarily unavailable (5xx, 429, 408).
+
+    Being a RequestException, it is retried with backoff by callers that retry failed requests (JSONLSender);
+    the response is attached, so its Retry-After is honoured too.
+    """
+
+
+def _jwt_expiry(token):
+    """`exp` claim of a JWT, or None if the token is not a JWT."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenAuth(AuthBase):
+    """Bearer-token auth for requests: fetches a token from `/token` with Basic credentials once and caches it.
+
+    The token is shared by all threads using the session and refreshed shortly before it expires, or when the
+    server answers 401 (the request is then resent once with a fresh token). "Shortly" is `refresh_margin`
+    seconds, but at most a quarter of the token's lifetime, so short-lived tokens are not fetched anew for every
+    request. The expiry comes from `expires_in` in the token response, else from a JWT `exp` claim, else
+    DEFAULT_TOKEN_TTL.
+    """
+
+    def __init__(self, token_url, username, password, verify=True, timeout=TOKEN_TIMEOUT,
+                 refresh_margin=REFRESH_MARGIN, log=None):
+        self.token_url = token_url
+        self.basic = HTTPBasicAuth(username, password)
+        self.verify = verify
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self.margin = 0.0  # refresh_margin, capped to a quarter of the current token's lifetime
+        self.log = log or logging.info
+        self.lock = threading.Lock()
+        self.current = None
+        self.expires_at = 0.0
+        self.refreshes = 0
+
+    def fetch(self):
+        response = requests.get(self.token_url, auth=self.basic, verify=self.verify, timeout=self.timeout)
+        if response.status_code in TRANSIENT_STATUSES:
+            raise TransientTokenError(f"Token endpoint unavailable. Status code: {response.status_code}",
+                                      response=response)
+        if response.status_code != 200:
+            raise TokenError(f"Authentication failed. Status code: {response.status_code}")
+        data = response.json()
+        token = data.get("token") or data.get("access_token")
+        if not token:
+            raise TokenError("Authentication failed: No token returned.")
+        if data.get("expires_in"):
+            expires_at = time.time() + float(data["expires_in"])
+        else:
+            expires_at = _jwt_expiry(token) or time.time() + DEFAULT_TOKEN_TTL
+        return token, expires_at
+
+    def token(self, stale=None):
+        """The cached token, fetched or refreshed if it is about to expire (or equals `stale`, i.e. got a 401)."""
+        with self.lock:
+            if self.current is None or self.current == stale or time.time() >= self.expires_at - self.margin:
+                self.current, self.expires_at = self.fetch()
+                self.margin = min(self.refresh_margin, max(0.0, self.expires_at - time.time()) / 4)
+                self.refreshes += 1
+                self.log(f"Authentication successful; token valid for {self.expires_at - time.time():.0f} s.")
+            return self.current
+
+    def __call__(self, request):
+        token = self.token()
+        request.headers["Authorization"] = f"Bearer {token}"
+        request.register_hook("response", self.handle_401)
+        return request
+
+    def handle_401(self, response, **kwargs):
+        """Resend a request rejected with 401 once, with a freshly fetched token."""
+        if response.status_code != 401 or getattr(response.request, "_token_retried", False):
+            return response
+        sent_token = response.request.headers.get("Authorization", "").removeprefix("Bearer ")
+        token = self.token(stale=sent_token)
+        response.content  # consume the body so the connection can be reused
+        response.close()
+        retry = response.request.copy()
+        retry.headers["Authorization"] = f"Bearer {token}"
+        retry._token_retried = True
+        retried = response.connection.send(retry, **kwargs)
+        retried.history.append(response)
+        retried.request = retry
+        return retried
@@ -1,15 +1,14 @@
 import logging
-import os
+import multiprocessing
 import threading
 import tkinter as tk
-from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from pathlib import Path
 from tkinter import filedialog, ttk
 
-import dblib
-import jsonlines
+from jot_archive import ARCHIVE_SUFFIXES
+from jot_dedup import DEDUP_MODES
+from jot_pipeline import ENGINES, PARSERS, JotConverter
+from jot_writers import COMPRESSIONS, OUTPUT_FORMATS
 
 
 class App:
@@ -17,20 +16,64 @@ class App:
         self.root_window = root_window
         self.root_window.title("XML Jots Data Processing App.IG")
         self.folder_path = tk.StringVar(value="C:/Prod/test jots")
+        self.engine = tk.StringVar(value="thread")
+        self.parser = tk.StringVar(value="builtin")
+        self.skip_unchanged = tk.BooleanVar(value=True)
+        self.autotune = tk.BooleanVar(value=False)
+        self.dedup = tk.StringVar(value="off")
+        self.dedup_on_disk = tk.BooleanVar(value=False)
+        self.output_format = tk.StringVar(value="jsonl")
+        self.compression = tk.StringVar(value="none")
+        self.shard_records = tk.IntVar(value=0)  # 0 = no rotation by record count
+        self.shard_megabytes = tk.IntVar(value=0)  # 0 = no rotation by size
+        self.memory_budget = tk.IntVar(value=512)  # MB for buffered records across all origins; 0 = no budget
         self.abort_event = threading.Event()
         self.start_time = None
-        self.total_files = 0
-        self.processed_files = 0
         self.processing_done = False  # flag to stop periodic updates when done
         self.progress_update_interval = 1000  # in milliseconds
-        self.origin_output_files = {}  # Keep track of output files for each origin
+        self.converter = JotConverter(log=self.log, abort_event=self.abort_event)
         self.setup_ui()
 
     def setup_ui(self):
         """Set up the UI elements for the application."""
-        tk.Label(self.root_window, text="Folder:").grid(row=0, column=0, sticky="w")
+        tk.Label(self.root_window, text="Folder or archive:").grid(row=0, column=0, sticky="w")
         tk.Entry(self.root_window, textvariable=self.folder_path, width=50).grid(row=0, column=1)
-        tk.Button(self.root_window, text="Browse", command=self.browse_folder).grid(row=0, column=2)
+        browse_frame = tk.Frame(self.root_window)
+        browse_frame.grid(row=0, column=2)
+        tk.Button(browse_frame, text="Browse", command=self.browse_folder).pack(side="left")
+        tk.Button(browse_frame, text="Archive", command=self.browse_archive).pack(side="left")
+
+        # Processing options
+        options_frame = tk.Frame(self.root_window)
+        options_frame.grid(row=1, column=0, columnspan=3, sticky="w")
+        tk.Label(options_frame, text="Engine:").pack(side="left")
+        ttk.Combobox(options_frame, textvariable=self.engine, values=ENGINES, state="readonly",
+                     width=8).pack(side="left", padx=(0, 5))
+        tk.Label(options_frame, text="Parser:").pack(side="left")
+        ttk.Combobox(options_frame, textvariable=self.parser, values=PARSERS, state="readonly",
+                     width=8).pack(side="left", padx=(0, 5))
+        tk.Checkbutton(options_frame, text="Autotune workers", variable=self.autotune).pack(side="left")
+        tk.Checkbutton(options_frame, text="Skip unchanged files", variable=self.skip_unchanged).pack(side="left")
+        tk.Label(options_frame, text="Dedup:").pack(side="left")
+        ttk.Combobox(options_frame, textvariable=self.dedup, values=DEDUP_MODES, state="readonly",
+                     width=12).pack(side="left", padx=(0, 5))
+        tk.Checkbutton(options_frame, text="On-disk index", variable=self.dedup_on_disk).pack(side="left")
+
+        # Output options
+        output_frame = tk.Frame(self.root_window)
+        output_frame.grid(row=2, column=0, columnspan=3, sticky="w")
+        tk.Label(output_frame, text="Format:").pack(side="left")
+        ttk.Combobox(output_frame, textvariable=self.output_format, values=OUTPUT_FORMATS, state="readonly",
+                     width=7).pack(side="left", padx=(0, 5))
+        tk.Label(output_frame, text="Compression:").pack(side="left")
+        ttk.Combobox(output_frame, textvariable=self.compression, values=COMPRESSIONS, state="readonly",
+                     width=6).pack(side="left", padx=(0, 5))
+        tk.Label(output_frame, text="Shard records:").pack(side="left")
+        tk.Entry(output_frame, textvariable=self.shard_records, width=8).pack(side="left", padx=(0, 5))
+        tk.Label(output_frame, text="Shard MB:").pack(side="left")
+        tk.Entry(output_frame, textvariable=self.shard_megabytes, width=6).pack(side="left", padx=(0, 5))
+        tk.Label(output_frame, text="Memory MB:").pack(side="left")
+        tk.Entry(output_frame, textvariable=self.memory_budget, width=6).pack(side="left")
         self.process_button = tk.Button(self.root_window, text="Process",
                                         command=self.start_processing, state=tk.DISABLED)
         self.abort_button = tk.Button(self.root_window, text="Abort",
@@ -55,22 +98,29 @@ class App:
         self.time_elapsed_label = tk.Label(self.root_window, text="Elapsed Time: 00:00:00.0")
         self.time_remaining_label = tk.Label(self.root_window, text="Remaining Time: 00:00:00.0")
         self.files_processed_label = tk.Label(self.root_window, text="Files Processed: 0")
+        self.throughput_label = tk.Label(self.root_window, text="Throughput: -")
+        self.bottleneck_label = tk.Label(self.root_window, text="Busiest stage: -")
         self.time_start_label.grid(row=7, column=0)
         self.time_elapsed_label.grid(row=7, column=1)
         self.time_remaining_label.grid(row=7, column=2)
         self.files_processed_label.grid(row=6, column=2)
+        self.throughput_label.grid(row=9, column=0, columnspan=2, sticky="w")
+        self.bottleneck_label.grid(row=9, column=2, sticky="w")
 
     def update_progress(self):
-        """Periodic update for the progress bar and labels."""
-        if self.total_files > 0:
-            percent = (self.processed_files / self.total_files) * 100
+        """Periodic update for the progress bar, labels and metrics file."""
+        converter = self.converter
+        if converter.total_files > 0:
+            percent = (converter.processed_files / converter.total_files) * 100
             self.progress["value"] = percent
-            self.files_processed_label.config(text=f"Files Processed: {self.processed_files}")
+            self.files_processed_label.config(text=f"Files Processed: {converter.processed_files}")
             elapsed = (datetime.now() - self.start_time).total_seconds()
-            if self.processed_files > 0:
-                remaining = max(0, ((elapsed / self.processed_files) * self.total_files) - elapsed)
-            else:
-                remaining = 0
+            remaining = 0
+            if converter.metrics is not None:
+                # Smoothed, byte-based rate: robust when small and huge jots are mixed.
+                converter.metrics.tick()
+                remaining = converter.metrics.eta_seconds() or 0
+                self.update_metrics_labels(converter)
             format_time = lambda s: f"{int(s//3600):02}:{int((s % 3600)//60):02}:{int(s % 60):02}.{int((s % 1)*10):1}"
             self.time_elapsed_label.config(text=f"Elapsed Time: {format_time(elapsed)}")
             self.time_remaining_label.config(text=f"Remaining Time: {format_time(remaining)}")
@@ -78,6 +128,15 @@ class App:
         if not self.processing_done:
             self.root_window.after(self.progress_update_interval, self.update_progress)
 
+    def update_metrics_labels(self, converter):
+        snapshot = converter.metrics.snapshot()
+        self.throughput_label.config(
+            text=f"Throughput: {snapshot['ewma_files_per_s']:.1f} files/s, "
+                 f"{snapshot['ewma_bytes_per_s'] / 1e6:.2f} MB/s")
+        stage, utilization = converter.metrics.bottleneck()
+        self.bottleneck_label.config(text=f"Busiest stage: {stage} ({utilization:.0%})")
+        converter.write_metrics()
+
     def log(self, message, error=False, to_file=True):
         self.root_window.after(0, self._log_ui_update, message)
         if to_file:
@@ -95,6 +154,13 @@ class App:
             self.folder_path.set(folder)
             self.process_button.config(state=tk.NORMAL)
 
+    def browse_archive(self):
+        self.process_button.config(state=tk.DISABLED)
+        patterns = " ".join(f"*{suffix}" for suffix in ARCHIVE_SUFFIXES)
+        if archive := filedialog.askopenfilename(filetypes=[("Jot archives", patterns), ("All files", "*.*")]):
+            self.folder_path.set(archive)
+            self.process_button.config(state=tk.NORMAL)
+
     def abort_processing(self):
         self.abort_event.set()
         self.abort_button.config(state=tk.DISABLED)
@@ -109,8 +175,7 @@ class App:
         self.files_processed_label.config(text="Files Processed: 0")
 
         # Initialize tracking variables
-        self.processed_files = 0  # Reset the processed files count
-        self.total_files = 0  # Reset the total files count
+        self.converter = JotConverter(log=self.log, abort_event=self.abort_event)
         self.start_time = datetime.now()  # Set the start time for the new process
         self.processing_done = False  # Ensure the process is not marked as done
         self.abort_event.clear()  # Reset the abort event
@@ -139,87 +204,44 @@ class App:
         self.root_window.after(self.progress_update_interval, self.update_progress)
 
         # Start processing in a separate thread
-        threading.Thread(target=self.process_folder, args=(folder,), daemon=True).start()
+        threading.Thread(target=self.process_folder, args=(folder, self.collect_options()), daemon=True).start()
+
+    def collect_options(self):
+        """Snapshot the UI options on the Tk thread so the worker thread never touches Tk variables."""
+        return {
+            "engine": self.engine.get(),
+            "parser": self.parser.get(),
+            "autotune": self.autotune.get(),
+            "skip_unchanged": self.skip_unchanged.get(),
+            "dedup": self.dedup.get(),
+            "dedup_index": "disk" if self.dedup_on_disk.get() else "memory",
+            "output_format": self.output_format.get(),
+            "compression": self.compression.get(),
+            "shard_records": self.int_option(self.shard_records),
+            "shard_bytes": self.int_option(self.shard_megabytes) * 1024 * 1024,
+            "memory_budget_mb": self.int_option(self.memory_budget),
+        }
+
+    def int_option(self, variable):
+        """Non-negative integer from an entry; blank or invalid input counts as 0 (disabled)."""
+        try:
+            return max(0, variable.get())
+        except tk.TclError:
+            self.log("Ignoring an invalid limit; using 0 (no limit).", error=True)
+            return 0
 
-    def process_folder(self, folder):
+    def process_folder(self, folder, options=None):
         try:
-            self.log("Reading the folder... Please wait.")
-            files = list(Path(folder).glob("*.xml"))
-            self.total_files = len(files)
-            if self.total_files == 0:
-                self.log("No XML files found.", error=True)
-                self.processing_done = True
-                return
-
-            self.log(f"Processing {self.total_files} files in {folder}.")
-            # Group records by origin; each group is a list of JSON records.
-            grouped = defaultdict(list)
-
-            # Update output files with a new timestamp at the start of each process
-            timestamp = datetime.now().strftime('%Y_%m_%d_%H_%M_%S')
-            self.origin_output_files = {origin: Path(f"{origin}_processed_data_{timestamp}.jsonl")
-                                        for origin in set()}
-
-            with ThreadPoolExecutor(max_workers=os.cpu_count() * 2) as executor:
-                future_to_file = {executor.submit(self.safe_process_file, file): file for file in files}
-                for future in as_completed(future_to_file):
-                    if self.abort_event.is_set():
-                        break
-                    result = future.result()
-                    self.processed_files += 1
-
-                    if result is not None:
-                        origin = result.get("origin", "unknown")
-                        grouped[origin].append(result)
-                        # Dump batch for this origin if batch reaches 10,000 records.
-                        if len(grouped[origin]) >= 10000:
-                            self.append_to_output_file(origin, grouped[origin])
-                            grouped[origin].clear()
-
-            # Dump remaining records for all origins
-            for origin, records in grouped.items():
-                if records:
-                    self.append_to_output_file(origin, records)
-
-            self.log(f"Processing completed. Total time elapsed: {datetime.now() - self.start_time}")
-
-        except Exception as e:
-            self.log(f"Error processing folder {folder}: {e}", error=True)
+            self.converter.process_folder(folder, options)
         finally:
             self.processing_done = True
             self.process_button.config(state=tk.NORMAL)
             self.abort_button.config(state=tk.DISABLED)
             self.abort_event.clear()
 
-    def safe_process_file(self, file):
-        if self.abort_event.is_set():
-            return None
-        try:
-            return dblib.parse_xml_to_json(file)
-        except Exception as e:
-            self.log(f"Error parsing {file.name}: {e}", error=True)
-            return None
-
-    def append_to_output_file(self, origin, records):
-        """Append the processed records to the output file for the origin."""
-        if origin not in self.origin_output_files:
-            # If no file for this origin yet, create it with the timestamped name.
-            timestamp = datetime.now().strftime('%Y_%m_%d_%H_%M_%S')
-            output_file = Path(f"{origin}_processed_data_{timestamp}.jsonl")
-            self.origin_output_files[origin] = output_file
-        else:
-            # Use the existing output file for this origin
-            output_file = self.origin_output_files[origin]
-
-        try:
-            with jsonlines.open(output_file, mode="a") as writer:
-                writer.write_all(records)
-            self.log(f"Wrote {len(records)} records to {output_file}")
-        except Exception as e:
-            self.log(f"Error writing to {output_file}: {e}", error=True)
-
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # required for the process engine in frozen Windows builds
     root = tk.Tk()
     app = App(root)
     tk.Label(root, text="Server Log:").grid(row=8, column=0, columnspan=3, sticky="w")
@@ -0,0 +1,196 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import psutil
+except ImportError:  # fall back to the kernel's own high-water mark (POSIX only)
+    psutil = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from jot_corpus import SIZE_DISTRIBUTIONS, generate_corpus
+from jot_dedup import DEDUP_INDEXES, DEDUP_MODES
+from jot_pipeline import ENGINES, JotConverter, default_workers
+
+RSS_SAMPLE_INTERVAL = 0.1  # seconds
+
+
+class PeakRssSampler:
+    """Samples the resident set size of this process plus its children (process-pool workers).
+
+    Without psutil the peak is the larger of this process' and its reaped children's ru_maxrss, which
+    covers the whole process lifetime rather than just the measured run.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.process = psutil.Process() if psutil is not None else None
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        if self.process is None:
+            if resource is not None:
+                maxrss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                             resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+                self.peak = max(self.peak, maxrss * 1024)  # KiB on Linux
+            return
+        rss = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        self.peak = max(self.peak, rss)
+
+    def _run(self):
+        if self.process is None:
+            return
+        while not self.stop_event.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self._sample()
+
+
+def output_sizes(output_dir):
+    """Bytes written per origin, summed over all files of the origin (shards, Parquet pairs)."""
+    sizes = defaultdict(int)
+    for path in Path(output_dir).iterdir():
+        if "_processed_data_" in path.name:
+            sizes[path.name.split("_processed_data_")[0]] += path.stat().st_size
+    return dict(sizes)
+
+
+def run_once(corpus, engine, workers, options):
+    """Convert the corpus once into a scratch directory and return the measurements as a dict."""
+    output_dir = tempfile.mkdtemp(prefix="xml2json_bench_")
+    errors = []
+    try:
+        converter = JotConverter(log=lambda message, error=False: errors.append(message) if error else None)
+        run_options = {**options, "engine": engine, "workers": workers, "output_dir": output_dir,
+                       "skip_unchanged": False, "metrics_file": os.path.join(output_dir, "metrics.json")}
+        started = time.perf_counter()
+        with PeakRssSampler() as rss:
+            completed = converter.process_folder(corpus, run_options)
+        elapsed = time.perf_counter() - started
+        snapshot = converter.metrics.snapshot() if converter.metrics is not None else {}
+        stage, utilization = converter.metrics.bottleneck() if converter.metrics is not None else (None, 0)
+        return {
+            "engine": engine,
+            "workers": workers,
+            "parser": run_options.get("parser", "builtin"),
+            "output_format": run_options.get("output_format", "jsonl"),
+            "compression": run_options.get("compression", "none"),
+            "dedup": run_options.get("dedup", "off"),
+            "autotune": run_options.get("autotune", False),
+            "memory_budget_mb": run_options.get("memory_budget_mb", 0),
+            "final_workers": converter.tuner.concurrency if converter.tuner is not None else workers,
+            "completed": completed,
+            "files": converter.processed_files,
+            "input_bytes": snapshot.get("bytes_done", 0),
+            "seconds": round(elapsed, 3),
+            "files_per_s": round(converter.processed_files / elapsed, 1) if elapsed else 0.0,
+            "mb_per_s": round(snapshot.get("bytes_done", 0) / 1e6 / elapsed, 2) if elapsed else 0.0,
+            "peak_rss_mb": round(rss.peak / 1e6, 1),
+            "busiest_stage": stage,
+            "busiest_stage_utilization": round(utilization, 3),
+            "stages": {name: {"total_s": data["total_s"], "p50_s": data["p50_s"], "p99_s": data["p99_s"]}
+                       for name, data in snapshot.get("stages", {}).items()},
+            "origin_output_bytes": output_sizes(output_dir),
+            "duplicates_dropped": converter.duplicates_dropped,
+            "errors": len(errors),
+        }
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the xml2json2 conversion pipeline headlessly.")
+    parser.add_argument("--corpus", help="existing jot folder; generated into a temp folder when omitted")
+    parser.add_argument("--files", type=int, default=5000, help="jots to generate")
+    parser.add_argument("--origins", default="supplier:0.7,inhouse:0.3")
+    parser.add_argument("--tests-mean", type=int, default=20)
+    parser.add_argument("--size-dist", choices=SIZE_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="share of generated jots re-using an sn")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engines", default=",".join(ENGINES), help="comma separated")
+    parser.add_argument("--workers", default="", help="comma separated counts; default is each engine's default")
+    parser.add_argument("--parser", default="builtin")
+    parser.add_argument("--format", default="jsonl")
+    parser.add_argument("--compression", default="none")
+    parser.add_argument("--memory-budget", type=int, default=0, help="MB for buffered records; 0 = no budget")
+    parser.add_argument("--autotune", action="store_true", help="let the tuner adjust from each worker count")
+    parser.add_argument("--dedup", choices=DEDUP_MODES, default="off")
+    parser.add_argument("--dedup-index", choices=DEDUP_INDEXES, default="memory")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--results", default="xml2json_bench_results.jsonl",
+                        help="JSONL file the run report is appended to")
+    args = parser.parse_args()
+
+    corpus = args.corpus
+    generated = None
+    if not corpus:
+        generated = corpus = tempfile.mkdtemp(prefix="jot_corpus_")
+        files, total_bytes = generate_corpus(corpus, args.files, args.origins, args.tests_mean,
+                                             size_distribution=args.size_dist, duplicate_rate=args.duplicates,
+                                             seed=args.seed)
+        print(f"Generated {files} jots ({total_bytes / 1e6:.1f} MB) in {corpus}")
+
+    options = {"parser": args.parser, "output_format": args.format, "compression": args.compression,
+               "dedup": args.dedup, "dedup_index": args.dedup_index, "autotune": args.autotune,
+               "memory_budget_mb": args.memory_budget}
+    worker_counts = [int(count) for count in args.workers.split(",") if count.strip()]
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "corpus": args.corpus or {"generated_files": args.files, "origins": args.origins,
+                                  "tests_mean": args.tests_mean, "size_dist": args.size_dist, "duplicates": args.duplicates,
+                                  "seed": args.seed},
+        "runs": [],
+    }
+    try:
+        for engine in args.engines.split(","):
+            for workers in worker_counts or [default_workers(engine)]:
+                for repeat in range(args.repeat):
+                    result = run_once(corpus, engine, workers, options)
+                    result["repeat"] = repeat
+                    report["runs"].append(result)
+                    print(f"{engine:7} workers={workers:<3} {result['files_per_s']:>9.1f} files/s "
+                          f"{result['mb_per_s']:>7.2f} MB/s  peak RSS {result['peak_rss_mb']:.0f} MB  "
+                          f"busiest: {result['busiest_stage']}")
+    finally:
+        if generated:
+            shutil.rmtree(generated, ignore_errors=True)
+
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(report) + "\n")
+    print(f"Report appended to {args.results}")
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()